@@ -0,0 +1,262 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from feature_store import RAW_PATH, STORE_DIR, load_artifact_manifest, load_feature_store, save_artifact
+from search import ExactSearch, SearchBackend, top_k_rows
+
+# -------------------------------------------------------------
+# IVF (K-MEANS PARTITIONED) APPROXIMATE SEARCH
+# -------------------------------------------------------------
+#
+# Tenants are clustered with spherical k-means into 'n_lists' inverted
+# lists. A query only scores the tenants of the 'n_probe' lists whose
+# centroids are closest to it, so latency grows with n_probe / n_lists
+# instead of with the dataset size. Raising n_probe trades latency for recall.
+
+CENTROIDS_FILE = "ivf_centroids.f32"
+VECTORS_FILE = "ivf_vectors.f32"
+ROWS_FILE = "ivf_rows.i64"
+OFFSETS_FILE = "ivf_offsets.i64"
+IVF_MANIFEST_FILE = "ivf_manifest.json"
+
+
+def _assign(matrix, centroids, block_size):
+    """Index of the closest centroid of every row, computed in blocks."""
+    labels = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), block_size):
+        stop = min(start + block_size, len(matrix))
+        labels[start:stop] = np.argmax(matrix[start:stop] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(matrix, n_lists, n_iter=10, sample_size=None, seed=0, block_size=65536):
+    """
+    Spherical k-means on a random sample of rows.
+
+    Returns:
+    - float32 array (n_lists x d) of L2-normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    n = len(matrix)
+    sample_size = min(n, sample_size or max(n_lists * 64, 10000))
+    sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(sample, centroids, block_size)
+        order = np.argsort(labels, kind="stable")
+        present, starts = np.unique(labels[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+        counts = np.bincount(labels, minlength=n_lists)
+
+        # Re-seed empty lists with random sample rows
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+    return centroids
+
+
+class IVFIndex(SearchBackend):
+    """
+    Inverted-file index over an L2-normalized matrix.
+
+    Attributes:
+    - centroids: (n_lists x d) list centroids
+    - vectors: Rows of the matrix reordered so each list is contiguous
+    - rows: Original row index of every entry of 'vectors'
+    - offsets: List i spans vectors[offsets[i]:offsets[i + 1]]
+    - n_probe: Lists scanned per query (recall / latency knob)
+    """
+
+    name = "ivf"
+
+    def __init__(self, centroids, vectors, rows, offsets, n_probe=8):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.rows = rows
+        self.offsets = offsets
+        self.n_probe = n_probe
+
+        # Position of every original row inside 'vectors'
+        self.positions = np.empty(len(rows), dtype=np.int64)
+        self.positions[rows] = np.arange(len(rows))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=10, sample_size=None, n_probe=8, seed=0):
+        """
+        Trains the centroids and files every row of 'matrix' into its list.
+
+        Parameters:
+        - matrix: L2-normalized float32 matrix (n x d)
+        - n_lists: Number of lists (default: about 4 * sqrt(n))
+        - n_iter: k-means iterations
+        - sample_size: Rows used to train the centroids
+        - n_probe: Default lists scanned per query
+        """
+        n = len(matrix)
+        if n_lists is None:
+            n_lists = max(1, min(n, int(4 * np.sqrt(n))))
+
+        centroids = train_centroids(matrix, n_lists, n_iter, sample_size, seed)
+        labels = _assign(matrix, centroids, block_size=65536)
+
+        rows = np.argsort(labels, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=n_lists)))).astype(np.int64)
+        vectors = np.asarray(matrix[rows], dtype=np.float32)
+        return cls(centroids, vectors, rows, offsets, n_probe)
+
+    def vectors_for(self, rows):
+        return self.vectors[self.positions[rows]]
+
+    def search(self, queries, k, exclude=None, mask=None, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        n_queries = len(queries)
+        rows = np.full((n_queries, k), -1, dtype=np.int64)
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+
+        probes, _ = top_k_rows(queries @ self.centroids.T, n_probe)
+        for q in range(n_queries):
+            starts = self.offsets[probes[q]]
+            stops = self.offsets[probes[q] + 1]
+            positions = np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)])
+            candidate_rows = self.rows[positions]
+
+            candidate_scores = self.vectors[positions] @ queries[q]
+            if mask is not None:
+                candidate_scores[~mask[candidate_rows]] = -np.inf
+            if exclude is not None:
+                candidate_scores[np.isin(candidate_rows, exclude[q])] = -np.inf
+
+            top, values = top_k_rows(candidate_scores[None, :], k)
+            found = top[0] >= 0
+            n_found = int(found.sum())
+            rows[q, :n_found] = candidate_rows[top[0][found]]
+            scores[q, :n_found] = values[0][found]
+
+        return rows, scores
+
+    # ---------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------
+
+    def save(self, store):
+        """Writes the index next to the feature store, tagged with its version."""
+        arrays = {
+            CENTROIDS_FILE: self.centroids,
+            VECTORS_FILE: self.vectors,
+            ROWS_FILE: self.rows.astype(np.int64),
+            OFFSETS_FILE: self.offsets,
+        }
+        save_artifact(store, IVF_MANIFEST_FILE, arrays, n_rows=int(len(self.rows)), n_lists=int(self.n_lists),
+                      n_features=int(self.centroids.shape[1]), n_probe=int(self.n_probe))
+
+    @classmethod
+    def load(cls, store, n_probe=None):
+        """
+        Memory-maps the index built for this feature store.
+
+        Returns:
+        - IVFIndex, or None if no index was built or it belongs to an older store version
+        """
+        manifest = load_artifact_manifest(store, IVF_MANIFEST_FILE)
+        if manifest is None:
+            return None
+
+        n, d, n_lists = manifest["n_rows"], manifest["n_features"], manifest["n_lists"]
+        path = lambda name: os.path.join(store.store_dir, name)
+        return cls(
+            np.fromfile(path(CENTROIDS_FILE), dtype=np.float32).reshape(n_lists, d),
+            np.memmap(path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(n, d)),
+            np.memmap(path(ROWS_FILE), dtype=np.int64, mode="r", shape=(n,)),
+            np.fromfile(path(OFFSETS_FILE), dtype=np.int64),
+            n_probe or manifest["n_probe"],
+        )
+
+
+# -------------------------------------------------------------
+# RECALL / LATENCY BENCHMARK
+# -------------------------------------------------------------
+
+def benchmark_recall(matrix, index, n_queries=200, k=10, n_probes=(1, 2, 4, 8, 16, 32), seed=0):
+    """
+    Compares the IVF index with the exact backend on random single-seed queries.
+
+    Returns:
+    - List of dicts: n_probe, recall@k, mean and p99 latency (ms) per query,
+      plus the exact backend as the first entry
+    """
+    rng = np.random.default_rng(seed)
+    seeds = rng.choice(len(matrix), n_queries, replace=False)
+    queries = np.asarray(matrix[seeds], dtype=np.float32)
+    exclude = [np.array([s]) for s in seeds]
+
+    def timed(search):
+        latencies = []
+        results = []
+        for q in range(n_queries):
+            start = time.perf_counter()
+            rows, _ = search(queries[q:q + 1], [exclude[q]])
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(rows[0])
+        return np.array(results), np.array(latencies)
+
+    exact = ExactSearch(matrix)
+    truth, latencies = timed(lambda q, ex: exact.search(q, k, exclude=ex))
+    report = [{"backend": "exact", "n_probe": None, "recall": 1.0,
+               "mean_ms": float(latencies.mean()), "p99_ms": float(np.percentile(latencies, 99))}]
+
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            break
+        found, latencies = timed(lambda q, ex: index.search(q, k, exclude=ex, n_probe=n_probe))
+        hits = sum(len(np.intersect1d(found[q], truth[q])) for q in range(n_queries))
+        report.append({"backend": "ivf", "n_probe": n_probe, "recall": hits / (n_queries * k),
+                       "mean_ms": float(latencies.mean()), "p99_ms": float(np.percentile(latencies, 99))})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or benchmark the IVF approximate search index.")
+    parser.add_argument("command", choices=["build", "benchmark"])
+    parser.add_argument("--lists", type=int, default=None, help="Number of k-means lists")
+    parser.add_argument("--probe", type=int, default=8, help="Default lists scanned per query")
+    parser.add_argument("--iter", type=int, default=10, help="k-means iterations")
+    parser.add_argument("--queries", type=int, default=200, help="Benchmark queries")
+    parser.add_argument("--k", type=int, default=10, help="Benchmark top-k")
+    parser.add_argument("--raw", default=RAW_PATH, help="Raw tenant CSV")
+    parser.add_argument("--store", default=STORE_DIR, help="Feature store directory")
+    args = parser.parse_args()
+
+    store = load_feature_store(args.raw, args.store)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = IVFIndex.build(store.matrix, args.lists, args.iter, n_probe=args.probe)
+        index.save(store)
+        print(f"✅ IVF index ({index.n_lists} lists) for {len(store)} tenants built in "
+              f"{time.perf_counter() - start:.1f}s.")
+        return
+
+    index = IVFIndex.load(store)
+    if index is None:
+        print("⚠️ No IVF index for this feature store. Run `python ann_index.py build` first.")
+        return
+    for row in benchmark_recall(store.matrix, index, args.queries, args.k):
+        probe = "-" if row["n_probe"] is None else row["n_probe"]
+        print(f"{row['backend']:>5}  n_probe={probe:<4} recall@{args.k}={row['recall']:.3f}  "
+              f"mean={row['mean_ms']:.2f}ms  p99={row['p99_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,27 @@
 import streamlit as st
-from logic import compatible_tenants, df_raw
+import logic
 from ui_helpers import (
+    close_figure,
+    warm_up,
     generate_compatibility_chart,
     generate_compatibility_table,
-    generate_explanation_block
+    generate_explanation_block,
+    export_chart_png,
+    export_table_png,
+    table_export_available,
+    lazy_export,
+    memoized
 )
-import os
+from logic import compatible_tenants, explain_matches
+from weights import PROFILE_LABELS
+
+
+# DATASET – loaded once per process and shared by every session
+@st.cache_resource(show_spinner="Loading tenants...")
+def load_dataset():
+    warm_up()   # Plotting libraries load in the background meanwhile
+    logic.ensure_loaded()
+    return logic.df_raw, logic.attribute_index
 
 # PAGE CONFIGURATION
 st.set_page_config(layout="wide", page_title="Livio – Smart Roommate Matching", page_icon="🧩")
@@ -66,6 +82,11 @@ if language == "Español":
             "Only show non-smokers": "Solo mostrar no fumadores",
             "Only show healthy eaters": "Solo mostrar quienes siguen dieta",
             "Exclude pet allergies": "Excluir alergias a mascotas",
+            "More filters": "Más filtros",
+            "Budget range (€)": "Rango de presupuesto (€)",
+            "Sleep schedule": "Horario de sueño",
+            "Noise tolerance": "Tolerancia al ruido",
+            "Speaks any of": "Habla alguno de",
             "FIND MATCHES": "🔍 Buscar coincidencias",
             "Match Setup": "Configuración de coincidencia",
             "Match Scores": "Puntajes de coincidencia",
@@ -80,7 +101,11 @@ if language == "Español":
             "Shared Traits": "Principales rasgos compartidos",
             "Download": "Descargar",
             "No matches found with the selected filters.": "No se encontraron coincidencias con los filtros seleccionados.",
-            "Expand comparison table": "Expandir tabla de comparación"
+            "Expand comparison table": "Expandir tabla de comparación",
+            "What matters most?": "¿Qué es lo más importante?",
+            "Balanced": "Equilibrado",
+            "Quiet home": "Hogar tranquilo",
+            "Social": "Social"
         }
         return translations.get(text, text)
 
@@ -120,6 +145,8 @@ div.stButton > button:first-child:hover {{
 </style>
 """, unsafe_allow_html=True)
 
+df_raw, attribute_index = load_dataset()
+
 # SIDEBAR
 with st.sidebar:
     st.header(f"🔎 {_('Match Setup')}")
@@ -128,6 +155,8 @@ with st.sidebar:
     tenant2 = st.selectbox(_(f"Tenant 2 ID"), tenant_ids_available, index=1, key="t2")
     tenant3 = st.selectbox(_(f"Tenant 3 ID"), tenant_ids_available, index=2, key="t3")
     top_n = st.slider(_(f"How many new matches?"), 1, 10, value=5)
+    weight_profile = st.selectbox(_("What matters most?"), list(PROFILE_LABELS),
+                                  format_func=lambda name: _(PROFILE_LABELS[name]))
 
     st.markdown("---")
     st.subheader(f"🧼 {_('Optional Filters')}")
@@ -135,28 +164,45 @@ with st.sidebar:
     filter_diet = st.checkbox(_(f"Only show healthy eaters"), value=False)
     filter_pets = st.checkbox(_(f"Exclude pet allergies"), value=False)
 
+    with st.expander(_("More filters")):
+        budget_min = int(df_raw["budget"].min())
+        budget_max = int(df_raw["budget"].max())
+        budget_range = st.slider(_("Budget range (€)"), budget_min, budget_max, value=(budget_min, budget_max))
+        filter_sleep = st.multiselect(_("Sleep schedule"), sorted(attribute_index.values("sleep_schedule")))
+        filter_noise = st.multiselect(_("Noise tolerance"), sorted(attribute_index.values("noise_tolerance")))
+        filter_languages = st.multiselect(_("Speaks any of"), sorted(attribute_index.values("languages_spoken")))
+
     result = None
     if st.button(_(f"FIND MATCHES")):
         seed_ids = list(set([tenant1, tenant2, tenant3]))
-        result = compatible_tenants(seed_ids, top_n)
-
-        if not isinstance(result, str):
-            result_df, similarity_scores = result
-            matched_ids = similarity_scores.index.tolist()
-            filtered_ids = matched_ids
-            if filter_non_smokers:
-                filtered_ids = [i for i in filtered_ids if df_raw.loc[df_raw['id_tenant'] == i, 'smoker'].values[0] == "No"]
-            if filter_diet:
-                filtered_ids = [i for i in filtered_ids if df_raw.loc[df_raw['id_tenant'] == i, 'on_diet'].values[0] == "Yes"]
-            if filter_pets:
-                filtered_ids = [i for i in filtered_ids if df_raw.loc[df_raw['id_tenant'] == i, 'pet_allergy'].values[0] == "No"]
-
-            if len(filtered_ids) == 0:
-                st.session_state["result"] = _("No matches found with the selected filters.")
-            else:
-                filtered_scores = similarity_scores[similarity_scores.index.isin(filtered_ids)]
-                result_df = result_df.loc[:, result_df.columns.astype(str).isin([str(id) for id in seed_ids + filtered_ids])]
-                st.session_state["result"] = (result_df, filtered_scores)
+        filters = {}
+        if filter_non_smokers:
+            filters["smoker"] = "No"
+        if filter_diet:
+            filters["on_diet"] = "Yes"
+        if filter_pets:
+            filters["pet_allergy"] = "No"
+        if budget_range != (budget_min, budget_max):
+            filters["budget"] = {"min": budget_range[0], "max": budget_range[1]}
+        if filter_sleep:
+            filters["sleep_schedule"] = filter_sleep
+        if filter_noise:
+            filters["noise_tolerance"] = filter_noise
+        if filter_languages:
+            filters["languages_spoken"] = filter_languages
+
+        result = compatible_tenants(seed_ids, top_n, filters=filters, weights=weight_profile)
+
+        if isinstance(result, str):
+            st.session_state["result"] = result
+        elif result[1].empty:
+            st.session_state["result"] = _("No matches found with the selected filters.")
+        else:
+            st.session_state["result"] = result
+
+        # Figures and exported files belong to the previous result
+        st.session_state["exports"] = {}
+        st.session_state["weights"] = weight_profile
 
 # MAIN CONTENT
 result = st.session_state.get("result", None)
@@ -166,11 +212,21 @@ if isinstance(result, str):
 
 elif result is not None:
     result_df, similarity_scores = result
+
+    # Figures, explanations and files are built once per result and language
+    # (and theme), so reruns such as a language flip reuse them
+    exports = st.session_state.setdefault("exports", {})
+
     st.divider()
     st.markdown(f"## 🔗 {_('Compatibility Results')}")
 
     st.write(f"### 📊 {_('Match Scores')}")
-    fig_chart = generate_compatibility_chart(similarity_scores, language)
+    def render_chart():
+        fig = generate_compatibility_chart(similarity_scores, language)
+        close_figure(fig)   # Detached from pyplot; st.pyplot can still draw it
+        return fig
+
+    fig_chart = memoized(exports, ("chart_figure", language, theme), render_chart)
 
     with st.container():
         st.markdown("<div style='max-width: 850px; margin: auto;'>", unsafe_allow_html=True)
@@ -180,7 +236,8 @@ elif result is not None:
 
     st.markdown(f"### 🧬 {_('Profile Comparison')}")
     with st.expander(f"🔍 {_('Expand comparison table')}"):
-        fig_table = generate_compatibility_table(result, language)
+        fig_table = memoized(exports, ("table_figure", language, theme),
+                             lambda: generate_compatibility_table(result, language))
 
         st.markdown("""<div style="overflow-x: auto; overflow-y: auto; max-height: 600px;">""", unsafe_allow_html=True)
         st.plotly_chart(fig_table, use_container_width=False, config={
@@ -192,7 +249,11 @@ elif result is not None:
 
 
     st.markdown(f"### 🧠 {_('Why These Matches?')}")
-    explanation = generate_explanation_block(result_df.reset_index(), language)
+    seed_ids = [tenant_id for tenant_id in result_df.columns if tenant_id not in similarity_scores.index]
+    contributions = memoized(exports, "contributions", lambda: explain_matches(
+        seed_ids, similarity_scores.index, weights=st.session_state.get("weights")))
+    explanation = memoized(exports, ("explanation", language),
+                           lambda: generate_explanation_block(contributions, language))
 
     if explanation:
         with st.container():
@@ -210,21 +271,25 @@ elif result is not None:
 
     st.markdown("### 📥 " + (_("Export Files") if language == "English" else "Exportar archivos"))
 
+    # Files are rendered in memory when a button is clicked, once per result and language
     # CSV button
-    download_df = result_df.T.reset_index().rename(columns={"index": _("ATTRIBUTE")})
-    csv = download_df.to_csv(index=False).encode("utf-8")
+    def render_csv():
+        download_df = result_df.T.reset_index().rename(columns={"index": _("ATTRIBUTE")})
+        return download_df.to_csv(index=False).encode("utf-8")
+
     st.download_button(label="📄 " + (_("Results CSV") if language == "English" else "CSV de resultados"),
-                    data=csv, file_name="livio_results.csv", mime="text/csv")
+                    data=lazy_export(exports, ("csv", language), render_csv),
+                    file_name="livio_results.csv", mime="text/csv")
 
     # Chart PNG
-    with open("Media/chart_export.png", "rb") as chart_file:
-        st.download_button("📊 " + (_("Chart PNG") if language == "English" else "Gráfico de coincidencias"),
-                        chart_file, file_name="livio_chart.png", mime="image/png")
+    st.download_button("📊 " + (_("Chart PNG") if language == "English" else "Gráfico de coincidencias"),
+                    lazy_export(exports, ("chart", language), lambda: export_chart_png(similarity_scores, language)),
+                    file_name="livio_chart.png", mime="image/png")
 
     # Table PNG
-    if os.path.exists("Media/table_export.png"):
-        with open("Media/table_export.png", "rb") as table_file:
-            st.download_button("📋 " + (_("Table PNG") if language == "English" else "Tabla de comparación"),
-                            table_file, file_name="livio_table.png", mime="image/png")
+    if table_export_available():
+        st.download_button("📋 " + (_("Table PNG") if language == "English" else "Tabla de comparación"),
+                        lazy_export(exports, ("table", language), lambda: export_table_png(result, language)),
+                        file_name="livio_table.png", mime="image/png")
     else:
-        st.warning("📋 " + (_("Table export not available in this environment.") if language == "English" else "Exportar tabla no disponible en este entorno."))
\ No newline at end of file
+        st.warning("📋 " + (_("Table export not available in this environment.") if language == "English" else "Exportar tabla no disponible en este entorno."))
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------
+# PACKED BITMAPS
+# -------------------------------------------------------------
+
+class Bitmap:
+    """
+    Set of tenant rows stored as packed bits (8 rows per byte).
+
+    Bitmaps combine with & (AND), | (OR), ^ (XOR) and ~ (NOT), which run
+    over n/8 bytes instead of n booleans.
+    """
+
+    def __init__(self, bits, n):
+        self.bits = bits
+        self.n = n
+
+    @classmethod
+    def from_mask(cls, mask):
+        return cls(np.packbits(np.asarray(mask, dtype=bool)), len(mask))
+
+    @classmethod
+    def full(cls, n):
+        return cls.from_mask(np.ones(n, dtype=bool))
+
+    @classmethod
+    def empty(cls, n):
+        return cls(np.zeros((n + 7) // 8, dtype=np.uint8), n)
+
+    def __and__(self, other):
+        return Bitmap(self.bits & other.bits, self.n)
+
+    def __or__(self, other):
+        return Bitmap(self.bits | other.bits, self.n)
+
+    def __xor__(self, other):
+        return Bitmap(self.bits ^ other.bits, self.n)
+
+    def __invert__(self):
+        inverted = ~self.bits
+        # Keep the padding bits of the last byte cleared
+        tail = self.n % 8
+        if tail:
+            inverted[-1] &= np.uint8((0xFF << (8 - tail)) & 0xFF)
+        return Bitmap(inverted, self.n)
+
+    def to_mask(self):
+        """Unpacks into a boolean NumPy array of length n."""
+        return np.unpackbits(self.bits, count=self.n).astype(bool)
+
+    def count(self):
+        """Number of rows in the set."""
+        return int(np.unpackbits(self.bits, count=self.n).sum())
+
+    def __len__(self):
+        return self.n
+
+
+# -------------------------------------------------------------
+# ATTRIBUTE INDEX
+# -------------------------------------------------------------
+
+class AttributeIndex:
+    """
+    Precomputed index over raw tenant attributes for hard-constraint filtering.
+
+    - One packed bitmap per value of every low-cardinality column
+      (Yes/No columns, categoricals, cleanliness_rating...)
+    - One bitmap per token of multi-valued columns (languages_spoken)
+    - A sorted row order per numeric column for range queries (budget...)
+
+    Parameters:
+    - df_raw: DataFrame with the columns of 'tenants_dataset.csv' (string
+      columns may be categorical, see ProfileStore)
+    - multi_valued: Dict of multi-valued column -> token separator
+    - max_cardinality: Columns with more distinct values are not bitmapped
+    """
+
+    def __init__(self, df_raw, multi_valued=None, max_cardinality=64):
+        if multi_valued is None:
+            multi_valued = {"languages_spoken": ","}
+
+        self.n = len(df_raw)
+        self.multi_valued = dict(multi_valued)
+        self.bitmaps = {}
+        self.sorted_index = {}
+
+        for col in df_raw.columns:
+            if col == "id_tenant":
+                continue
+            series = df_raw[col]
+
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                self._index_categorical(col, series, max_cardinality)
+                continue
+
+            if col in self.multi_valued:
+                tokens = series.fillna("").str.split(self.multi_valued[col])
+                exploded = tokens.explode().str.strip()
+                rows = exploded.index.to_numpy()
+                codes, uniques = pd.factorize(exploded)
+                self.bitmaps[col] = {
+                    value: self._rows_bitmap(rows[codes == code])
+                    for code, value in enumerate(uniques) if value != ""
+                }
+                continue
+
+            if pd.api.types.is_numeric_dtype(series):
+                values = series.to_numpy()
+                order = np.argsort(values, kind="stable")
+                self.sorted_index[col] = (values[order], order)
+
+            codes, uniques = pd.factorize(series)
+            if len(uniques) <= max_cardinality:
+                self.bitmaps[col] = {
+                    self._plain(value): Bitmap.from_mask(codes == code)
+                    for code, value in enumerate(uniques)
+                }
+
+    def _index_categorical(self, col, series, max_cardinality):
+        # Codes + vocabulary are already there: no factorizing / string splitting per row
+        codes = series.cat.codes.to_numpy()
+        categories = series.cat.categories
+
+        if col in self.multi_valued:
+            token_codes = {}
+            for code, text in enumerate(categories):
+                for token in str(text).split(self.multi_valued[col]):
+                    if token.strip():
+                        token_codes.setdefault(token.strip(), []).append(code)
+            self.bitmaps[col] = {token: Bitmap.from_mask(np.isin(codes, token_code_list))
+                                 for token, token_code_list in token_codes.items()}
+            return
+
+        if len(categories) <= max_cardinality:
+            self.bitmaps[col] = {self._plain(value): Bitmap.from_mask(codes == code)
+                                 for code, value in enumerate(categories)}
+
+    @staticmethod
+    def _plain(value):
+        # NumPy scalars -> Python scalars, so lookups with ints/strs match
+        return value.item() if hasattr(value, "item") else value
+
+    def _rows_bitmap(self, rows):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return Bitmap.from_mask(mask)
+
+    # ---------------------------------------------------------
+    # Primitive constraints
+    # ---------------------------------------------------------
+
+    def all(self):
+        return Bitmap.full(self.n)
+
+    def none(self):
+        return Bitmap.empty(self.n)
+
+    def values(self, col):
+        """Distinct indexed values (or tokens) of a column."""
+        return list(self.bitmaps[col].keys())
+
+    def eq(self, col, value):
+        """
+        Rows where 'col' equals 'value'. For multi-valued columns, rows whose
+        list contains 'value'.
+        """
+        if col not in self.bitmaps:
+            raise KeyError(f"Column '{col}' is not bitmap-indexed.")
+        bitmap = self.bitmaps[col].get(value)
+        return bitmap if bitmap is not None else self.none()
+
+    def isin(self, col, values):
+        """Rows where 'col' equals (or contains) any of 'values'."""
+        result = self.none()
+        for value in values:
+            result = result | self.eq(col, value)
+        return result
+
+    def between(self, col, low=None, high=None):
+        """Rows where low <= col <= high (either bound may be None)."""
+        if col not in self.sorted_index:
+            raise KeyError(f"Column '{col}' has no range index.")
+        sorted_values, order = self.sorted_index[col]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+        return self._rows_bitmap(order[start:stop])
+
+    # ---------------------------------------------------------
+    # Filter dicts
+    # ---------------------------------------------------------
+
+    def from_filters(self, filters):
+        """
+        ANDs a dict of constraints into one bitmap.
+
+        Each entry maps a column to:
+        - a single value: equality (or containment for multi-valued columns)
+        - a list/tuple/set of values: any of them
+        - a dict with "min" and/or "max": inclusive range on a numeric column
+        - a dict with "not": negation of the nested constraint
+        """
+        result = self.all()
+        for col, constraint in filters.items():
+            result = result & self._constraint(col, constraint)
+        return result
+
+    def _constraint(self, col, constraint):
+        if isinstance(constraint, dict):
+            if "not" in constraint:
+                return ~self._constraint(col, constraint["not"])
+            return self.between(col, constraint.get("min"), constraint.get("max"))
+        if isinstance(constraint, (list, tuple, set, frozenset)):
+            return self.isin(col, constraint)
+        return self.eq(col, constraint)
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------------------------------------------
+# IMPORT-TIME BUDGET
+# -------------------------------------------------------------
+#
+# Imports must stay side-effect free: no dataset loading, no directories
+# created and no plotting libraries loaded until they are used. Each import
+# is measured in a fresh interpreter (median of several runs) and checked
+# against its budget; the script exits with status 1 on any violation.
+#
+#   python benchmarks/import_budget.py
+#
+# Most of the remaining time is NumPy + pandas (about 0.45s here).
+
+BUDGETS_S = {
+    "logic": 0.8,
+    "ui_helpers": 0.8,
+    "logic, ui_helpers": 1.0,
+}
+
+# Must not be imported until the first render / download
+LAZY_MODULES = ("matplotlib", "seaborn", "plotly", "kaleido", "streamlit")
+
+_PROBE = """
+import json, os, sys, time
+before = set(os.listdir("."))
+start = time.perf_counter()
+import {modules}
+seconds = time.perf_counter() - start
+logic = sys.modules.get("logic")
+print(json.dumps({{
+    "seconds": seconds,
+    "lazy_loaded": sorted(m for m in {lazy!r} if m in sys.modules),
+    "dataset_loaded": logic is not None and "store" in vars(logic),
+    "new_files": sorted(set(os.listdir(".")) - before),
+}}))
+"""
+
+
+def measure_import(modules, runs=5):
+    """
+    Imports 'modules' in 'runs' fresh interpreters.
+
+    Returns:
+    - Dict with the median import time and the side effects of the last run
+    """
+    reports = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", _PROBE.format(modules=modules, lazy=LAZY_MODULES)],
+                                   cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        reports.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    report = reports[-1]
+    report["seconds"] = float(np.median([r["seconds"] for r in reports]))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times and side effects against their budgets.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per import")
+    args = parser.parse_args()
+
+    failures = 0
+    for modules, budget in BUDGETS_S.items():
+        report = measure_import(modules, args.runs)
+        problems = []
+        if report["seconds"] > budget:
+            problems.append(f"over budget ({budget:.2f}s)")
+        if report["lazy_loaded"]:
+            problems.append(f"loads {', '.join(report['lazy_loaded'])}")
+        if report["dataset_loaded"]:
+            problems.append("loads the dataset")
+        if report["new_files"]:
+            problems.append(f"creates {', '.join(report['new_files'])}")
+
+        failures += bool(problems)
+        status = "❌ " + "; ".join(problems) if problems else "✅"
+        print(f"import {modules:<20} {report['seconds']:.3f}s  {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
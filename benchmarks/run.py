@@ -0,0 +1,289 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# -------------------------------------------------------------
+# SCALING BENCHMARK
+# -------------------------------------------------------------
+#
+# For every dataset size, a synthetic dataset is generated once (cached in
+# benchmarks/data/) and measured in a fresh Python process started in its
+# own working directory, so import time and peak RSS are those of a real
+# cold start. Results are written as JSON; pass --compare with an earlier
+# file to print the change of every metric.
+#
+#   python benchmarks/run.py --sizes 15000 150000
+#   python benchmarks/run.py --compare benchmarks/results/<earlier>.json
+
+SIZES = [15_000, 150_000, 1_500_000, 5_000_000]
+DATA_DIR = os.path.join(REPO_DIR, "benchmarks", "data")
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+# Same kind of constraints the app's sidebar builds
+FILTERS = {
+    "smoker": "No",
+    "pet_allergy": "No",
+    "budget": {"min": 400, "max": 800},
+    "sleep_schedule": ["Early bird", "Flexible"],
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean())}
+
+
+def _timed(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _cold_import_s(module, runs=3):
+    """
+    Median import time of 'module' in a fresh interpreter: in the measuring
+    process NumPy and the project modules are already loaded.
+    """
+    probe = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    seconds = [float(subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                                    check=True).stdout)
+               for _ in range(runs)]
+    return float(np.median(seconds))
+
+
+# -------------------------------------------------------------
+# CHILD PROCESS: MEASUREMENTS FOR ONE DATASET
+# -------------------------------------------------------------
+
+def ids_sample(logic, n=3):
+    return np.asarray(logic.store.ids[:n]).tolist()
+
+
+def measure(n_queries, batch_size, seed):
+    """
+    Runs inside the dataset's working directory (see run_size).
+
+    Returns:
+    - Dict of metrics
+    """
+    report = {}
+
+    start = time.perf_counter()
+    from feature_store import build_feature_store
+    store = build_feature_store()
+    report["preprocessing_s"] = time.perf_counter() - start
+    report["peak_rss_preprocessing_mb"] = _peak_rss_mb()
+    del store
+
+    report["import_logic_s"] = _cold_import_s("logic")
+    import logic
+
+    start = time.perf_counter()
+    logic.ensure_loaded()
+    report["load_dataset_s"] = time.perf_counter() - start
+
+    report["import_ui_helpers_s"] = _cold_import_s("ui_helpers")
+    import ui_helpers
+
+    start = time.perf_counter()
+    ui_helpers.close_figure(ui_helpers.generate_compatibility_chart(logic.compatible_tenants(ids_sample(logic), 5)[1]))
+    report["first_render_s"] = time.perf_counter() - start
+
+    # Every query must be computed, not served from the result cache
+    from result_cache import ResultCache
+    logic.result_cache = ResultCache(max_entries=0)
+
+    rng = np.random.default_rng(seed)
+    ids = np.asarray(logic.store.ids)
+
+    report["filter_mask"] = _latency_summary(_timed(lambda: logic.build_filter_mask(FILTERS), n_queries))
+
+    queries = {}
+    for n_seeds in (1, 2, 3):
+        for label, filters in (("none", None), ("filtered", FILTERS)):
+            latencies = []
+            for _ in range(n_queries):
+                seeds = rng.choice(ids, n_seeds, replace=False).tolist()
+                start = time.perf_counter()
+                logic.compatible_tenants(seeds, 5, filters=filters)
+                latencies.append(time.perf_counter() - start)
+            queries[f"{n_seeds}_seeds_{label}"] = _latency_summary(latencies)
+    report["query"] = queries
+
+    # Same queries on the sharded backend (one shard per CPU)
+    logic.use_search_backend("sharded", min_rows=0)
+    latencies = []
+    for _ in range(n_queries):
+        seeds = rng.choice(ids, 1, replace=False).tolist()
+        start = time.perf_counter()
+        logic.compatible_tenants(seeds, 5)
+        latencies.append(time.perf_counter() - start)
+    report["query_sharded"] = _latency_summary(latencies)
+    logic.use_search_backend("exact")
+
+    groups = [rng.choice(ids, rng.integers(1, 4), replace=False).tolist() for _ in range(batch_size)]
+    start = time.perf_counter()
+    logic.compatible_tenants_batch(groups, 5)
+    elapsed = time.perf_counter() - start
+    report["batch"] = {"groups": batch_size, "seconds": elapsed, "groups_per_s": batch_size / elapsed}
+
+    result = logic.compatible_tenants(ids[:3].tolist(), 10)
+    seed_ids = ids[:3].tolist()
+    repeats = 5
+
+    def chart():
+        ui_helpers.close_figure(ui_helpers.generate_compatibility_chart(result[1]))
+
+    report["render"] = {
+        "chart": _latency_summary(_timed(chart, repeats)),
+        "chart_png": _latency_summary(_timed(lambda: ui_helpers.export_chart_png(result[1]), repeats)),
+        "table": _latency_summary(_timed(lambda: ui_helpers.generate_compatibility_table(result), repeats)),
+        "explanation": _latency_summary(_timed(
+            lambda: ui_helpers.generate_explanation_block(logic.explain_matches(seed_ids, result[1].index)), repeats)),
+    }
+
+    report["peak_rss_mb"] = _peak_rss_mb()
+    return report
+
+
+# -------------------------------------------------------------
+# PARENT PROCESS
+# -------------------------------------------------------------
+
+def prepare_dataset(n_rows, seed):
+    """
+    Returns the working directory holding a synthetic dataset of 'n_rows'
+    tenants plus a copy of metadata.xlsx, generating it on first use.
+    """
+    from benchmarks.generate import write_dataset
+
+    work_dir = os.path.join(DATA_DIR, f"{n_rows}-seed{seed}")
+    raw_path = os.path.join(work_dir, "tenants_dataset.csv")
+    if not os.path.exists(raw_path):
+        os.makedirs(work_dir, exist_ok=True)
+        print(f"⚙️ Generating {n_rows} synthetic tenants...")
+        write_dataset(raw_path, n_rows, os.path.join(REPO_DIR, "tenants_dataset.csv"), seed,
+                      metadata_path=os.path.join(REPO_DIR, "metadata.xlsx"))
+    shutil.copy(os.path.join(REPO_DIR, "metadata.xlsx"), work_dir)
+    return work_dir
+
+
+def run_size(n_rows, n_queries, batch_size, seed):
+    work_dir = prepare_dataset(n_rows, seed)
+    print(f"⚙️ Measuring {n_rows} tenants...")
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])),
+               MPLBACKEND="Agg")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child",
+         "--queries", str(n_queries), "--batch", str(batch_size), "--seed", str(seed)],
+        cwd=work_dir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark for {n_rows} tenants failed:\n{completed.stderr}")
+
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report["rows"] = n_rows
+    report["process_s"] = time.perf_counter() - start
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline, current):
+    """Prints every metric of 'current' next to the same metric of 'baseline'."""
+    previous = {r["rows"]: _flatten(r) for r in baseline["results"]}
+    for report in current["results"]:
+        if report["rows"] not in previous:
+            continue
+        print(f"\n{report['rows']} tenants (baseline {baseline['meta'].get('commit')} -> "
+              f"{current['meta'].get('commit')})")
+        before = previous[report["rows"]]
+        for metric, value in _flatten(report).items():
+            if metric in before and before[metric] and metric != "rows":
+                print(f"  {metric:<40} {before[metric]:>12.4g} -> {value:>12.4g}  ({value / before[metric]:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how matching scales with the number of tenants.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Dataset sizes to measure")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per latency measurement")
+    parser.add_argument("--batch", type=int, default=1000, help="Seed groups in the batch throughput run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.queries, args.batch, args.seed)))
+        return
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    results = {
+        "meta": {
+            "timestamp": timestamp,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "queries": args.queries,
+            "batch": args.batch,
+            "seed": args.seed,
+            "filters": FILTERS,
+        },
+        "results": [run_size(n, args.queries, args.batch, args.seed) for n in args.sizes],
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to '{out}'.")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import logic
+
+# -------------------------------------------------------------
+# OFFLINE BULK MATCHING
+# -------------------------------------------------------------
+#
+# Scores a large file of seed groups (e.g., every open room) overnight:
+#
+#   python bulk_match.py rooms.jsonl matches.jsonl --top-n 10 --reasons 3
+#   python bulk_match.py rooms.csv matches.csv --filters '{"smoker": "No"}'
+#   python bulk_match.py rooms.jsonl matches.jsonl --weights quiet_home
+#
+# Input is streamed, one seed group per record:
+# - JSONL: {"group_id": "room-12", "tenant_ids": [12, 55]} or just [12, 55]
+# - CSV: a 'tenant_ids' column (IDs separated by ';' or spaces) and an
+#   optional 'group_id' column
+#
+# Groups are read in fixed-size batches and each batch is scored by one
+# compatible_tenants_batch call. Several batches run at once on a thread
+# pool sharing the tenant matrix. Results are written in input order as
+# soon as a batch is done, as JSONL (one line per group) or CSV (one row
+# per match), so memory stays flat whatever the input size.
+#
+# After every written batch, a checkpoint (<output>.checkpoint) records how
+# many groups are done and the output size. Rerunning the same command
+# after an interruption truncates the output to the checkpoint and skips
+# the groups already done; the checkpoint is removed on completion.
+
+CSV_FIELDS = ["index", "group_id", "rank", "id_tenant", "similarity", "reasons", "error"]
+
+
+def _parse_ids(value):
+    if isinstance(value, str):
+        value = value.replace(";", " ").replace(",", " ").split()
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValueError("no tenant IDs")
+    return [int(i) for i in value]
+
+
+def read_groups(path, fmt=None):
+    """
+    Streams seed groups from a JSONL or CSV file.
+
+    Parameters:
+    - path: Input file
+    - fmt: "jsonl" or "csv" (default: from the file extension)
+
+    Returns:
+    - Iterator of (group_id, tenant_ids, error); malformed records yield
+      tenant_ids None and an error message instead of stopping the run
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                try:
+                    yield row.get("group_id") or None, _parse_ids(row.get("tenant_ids") or ""), None
+                except ValueError as e:
+                    yield row.get("group_id") or None, None, f"Invalid record: {e}"
+            return
+
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    yield record.get("group_id"), _parse_ids(record.get("tenant_ids")), None
+                else:
+                    yield None, _parse_ids(record), None
+            except (ValueError, TypeError) as e:
+                yield None, None, f"Invalid record: {e}"
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def match_batch(records, top_n, mask, reasons, weights=None):
+    """
+    Scores one batch of (group_id, tenant_ids, error) records.
+
+    Groups with unknown IDs are reported as errors; the others are scored
+    together.
+
+    Returns:
+    - List of result dicts, one per record
+    """
+    results = [{"group_id": group_id, "tenant_ids": tenant_ids, "matches": [], "error": error}
+               for group_id, tenant_ids, error in records]
+    valid = [i for i, result in enumerate(results) if result["error"] is None]
+
+    # One ID lookup for the whole batch
+    if valid:
+        sizes = [len(results[i]["tenant_ids"]) for i in valid]
+        rows = logic.store.rows_for_ids(np.concatenate([results[i]["tenant_ids"] for i in valid]))
+        known = np.minimum.reduceat(rows, np.cumsum([0] + sizes[:-1])) >= 0
+        for i in np.asarray(valid)[~known]:
+            results[i]["error"] = "One or more tenant IDs are out of range."
+        valid = [i for i, ok in zip(valid, known) if ok]
+
+    if valid:
+        batch = logic.compatible_tenants_batch([results[i]["tenant_ids"] for i in valid], top_n, mask,
+                                               weights=weights)
+        top_reasons = batch.top_reasons(reasons) if reasons else None
+        for g, i in enumerate(valid):
+            n = int(batch.counts[g])
+            results[i]["matches"] = [
+                {"id_tenant": int(batch.ids[g, r]), "similarity": float(batch.scores[g, r]),
+                 **({"reasons": top_reasons[g][r]} if top_reasons else {})}
+                for r in range(n)
+            ]
+    return results
+
+
+class ResultWriter:
+    """
+    Appends results to a JSONL or CSV file, flushed after every batch.
+    """
+
+    def __init__(self, path, fmt=None, append=False):
+        self.fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.csv = csv.writer(self.file) if self.fmt == "csv" else None
+        if self.csv is not None and self.file.tell() == 0:
+            self.csv.writerow(CSV_FIELDS)
+
+    def write(self, index, result):
+        if self.csv is None:
+            record = {"index": index, **{k: v for k, v in result.items() if k != "error" or v is not None}}
+            self.file.write(json.dumps(record) + "\n")
+        elif result["error"] is not None or not result["matches"]:
+            self.csv.writerow([index, result["group_id"], "", "", "", "", result["error"] or ""])
+        else:
+            for rank, match in enumerate(result["matches"], start=1):
+                self.csv.writerow([index, result["group_id"], rank, match["id_tenant"],
+                                   f"{match['similarity']:.6f}", ";".join(match.get("reasons", [])), ""])
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+# -------------------------------------------------------------
+# CHECKPOINTS
+# -------------------------------------------------------------
+
+def _checkpoint_path(output):
+    return f"{output}.checkpoint"
+
+
+def load_checkpoint(output, settings):
+    """
+    Returns:
+    - The checkpoint dict of an interrupted run of the same job, or None
+
+    Raises:
+    - ValueError if the checkpoint belongs to a different job, input file
+      contents or dataset version
+    """
+    path = _checkpoint_path(output)
+    if not os.path.exists(path) or not os.path.exists(output):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint["settings"] != settings:
+        raise ValueError(f"Checkpoint '{path}' was written with different settings, input or dataset version "
+                         f"({checkpoint['settings']}); rerun with --restart to start over.")
+    return checkpoint
+
+
+def save_checkpoint(output, settings, groups_done, output_bytes):
+    path = _checkpoint_path(output)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "groups_done": groups_done, "output_bytes": output_bytes}, f)
+    os.replace(tmp_path, path)
+
+
+# -------------------------------------------------------------
+# RUN
+# -------------------------------------------------------------
+
+def run(input_path, output_path, top_n=5, filters=None, reasons=0, batch_size=1024, workers=None,
+        restart=False, input_format=None, output_format=None, weights=None):
+    """
+    Matches every seed group of 'input_path' and writes the results to
+    'output_path', resuming an interrupted run unless 'restart'.
+
+    Returns:
+    - Dict with the number of groups, errors, skipped (resumed) groups and seconds
+    """
+    logic.ensure_loaded()
+    workers = max(1, workers or os.cpu_count() or 1)
+    # Size and mtime identify the input's contents: an edited file must not resume
+    stat = os.stat(input_path)
+    settings = {"input": os.path.abspath(input_path), "input_size": stat.st_size,
+                "input_mtime_ns": stat.st_mtime_ns, "top_n": top_n, "filters": filters,
+                "weights": weights, "reasons": reasons, "version": logic.store.version}
+
+    checkpoint = None if restart else load_checkpoint(output_path, settings)
+    skip = 0
+    if checkpoint is not None:
+        skip = checkpoint["groups_done"]
+        with open(output_path, "r+b") as f:  # Drop a partially written batch
+            f.truncate(checkpoint["output_bytes"])
+        print(f"⚙️ Resuming after {skip} groups.")
+    if os.path.exists(_checkpoint_path(output_path)) and checkpoint is None:
+        os.remove(_checkpoint_path(output_path))
+
+    # Filters and weights are the same for all groups: one mask for the whole
+    # run, and the weighted backend is built (and validated) once up front
+    mask = logic.build_filter_mask(filters)
+    logic.resolve_weights(weights)
+    writer = ResultWriter(output_path, output_format, append=checkpoint is not None)
+    groups = read_groups(input_path, input_format)
+    for _ in zip(range(skip), groups):
+        pass
+
+    start = time.perf_counter()
+    done, errors = skip, 0
+    in_flight = deque()
+
+    def write_oldest():
+        nonlocal done, errors
+        for result in in_flight.popleft().result():
+            writer.write(done, result)
+            errors += result["error"] is not None
+            done += 1
+        save_checkpoint(output_path, settings, done, writer.flush())
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk") as pool:
+            for records in batched(groups, batch_size):
+                in_flight.append(pool.submit(match_batch, records, top_n, mask, reasons, weights))
+                # Bounded read-ahead: memory stays flat
+                if len(in_flight) >= 2 * workers:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+    finally:
+        writer.close()
+
+    if os.path.exists(_checkpoint_path(output_path)):  # None is written for an empty input
+        os.remove(_checkpoint_path(output_path))
+    return {"groups": done - skip, "errors": errors, "skipped": skip, "seconds": time.perf_counter() - start}
+
+
+def _weights_arg(value):
+    return json.loads(value) if value.lstrip().startswith(("{", "[")) else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match a large file of seed groups against all tenants.")
+    parser.add_argument("input", help="Seed groups (.jsonl or .csv)")
+    parser.add_argument("output", help="Results (.jsonl or .csv)")
+    parser.add_argument("--top-n", type=int, default=5, help="Matches per group")
+    parser.add_argument("--filters", type=json.loads, default=None,
+                        help='Hard constraints for all groups, as JSON (e.g. \'{"smoker": "No"}\')')
+    parser.add_argument("--weights", type=_weights_arg, default=None,
+                        help='Trait weights: a profile name (quiet_home, social) or JSON (e.g. \'{"smoker": 3}\')')
+    parser.add_argument("--reasons", type=int, default=0, help="Top contributing attributes per match (0 = none)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Groups scored per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Batches scored in parallel (default: all cores)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"], default=None)
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], default=None)
+    args = parser.parse_args()
+
+    try:
+        summary = run(args.input, args.output, args.top_n, args.filters, args.reasons, args.batch_size,
+                      args.workers, args.restart, args.input_format, args.output_format, args.weights)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    rate = summary["groups"] / summary["seconds"] if summary["seconds"] else 0.0
+    print(f"✅ {summary['groups']} groups matched in {summary['seconds']:.1f}s ({rate:.0f} groups/s), "
+          f"{summary['errors']} errors, written to '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+
+from search import seed_centroids
+
+# -------------------------------------------------------------
+# SIMILARITY-ATTRIBUTED MATCH EXPLANATIONS
+# -------------------------------------------------------------
+#
+# A match's score is the dot product of its normalized row x with the seed
+# centroid c, i.e. the sum over encoded features of x_j * c_j. Summing
+# those per-feature terms over the encoded columns of each raw attribute
+# (one-hot values, language tokens, ...) splits the score exactly into
+# per-attribute contributions.
+
+
+def attribute_aggregation(columns, sources):
+    """
+    Maps encoded columns back to the raw attributes they come from.
+
+    Parameters:
+    - columns: Encoded feature names, in matrix order
+    - sources: Raw attribute of every encoded column (see TenantEncoder.sources)
+
+    Returns:
+    - Tuple (attributes, aggregation): the attributes in first-seen order and
+      a float32 (n_features x n_attributes) 0/1 matrix summing columns per attribute
+    """
+    if len(columns) != len(sources):
+        raise ValueError("Encoded columns and their sources do not line up.")
+    attributes = list(dict.fromkeys(sources))
+    position = {attribute: i for i, attribute in enumerate(attributes)}
+    aggregation = np.zeros((len(columns), len(attributes)), dtype=np.float32)
+    aggregation[np.arange(len(columns)), [position[s] for s in sources]] = 1.0
+    return attributes, aggregation
+
+
+def contribution_breakdown(matrix, seed_rows, match_rows, aggregation):
+    """
+    Per-attribute contributions to the score of every match, for all
+    groups and matches in one vectorized pass.
+
+    Parameters:
+    - matrix: L2-normalized feature matrix, or a function rows -> normalized
+      vectors (e.g., the vectors_for of a weighted search backend)
+    - seed_rows: List of int arrays (0-based rows), one per group
+    - match_rows: int array (n_groups x k) of matched rows, -1 for empty slots
+    - aggregation: Output of attribute_aggregation
+
+    Returns:
+    - float32 array (n_groups x k x n_attributes); each [g, i] sums to the
+      average cosine similarity of match i to the seeds of group g
+      (zeros for empty slots)
+    """
+    vectors_for = matrix if callable(matrix) else matrix.__getitem__
+    match_rows = np.asarray(match_rows, dtype=np.int64)
+    centroids = seed_centroids(vectors_for(np.concatenate(seed_rows)), [len(rows) for rows in seed_rows])
+    vectors = np.asarray(vectors_for(np.maximum(match_rows, 0)), dtype=np.float32)
+    contributions = (vectors * centroids[:, None, :]) @ aggregation
+    contributions[match_rows < 0] = 0.0
+    return contributions
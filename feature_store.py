@@ -0,0 +1,447 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import METADATA_PATH, load_encoder
+
+# -------------------------------------------------------------
+# ENCODING SCHEMA
+# -------------------------------------------------------------
+
+RAW_PATH = "tenants_dataset.csv"
+STORE_DIR = "feature_store"
+
+# Bump whenever the encoding below changes so existing stores are rebuilt
+SCHEMA_VERSION = 2
+
+MATRIX_FILE = "features.f32"
+NORMS_FILE = "norms.f32"
+IDS_FILE = "ids.i64"
+MANIFEST_FILE = "manifest.json"
+
+# Raw CSV rows encoded at a time when building the store
+CHUNKSIZE = 100_000
+
+# Scaled values within this distance of 0 / 1 count as sitting on a bound
+BOUND_TOLERANCE = 1e-6
+
+_encoder = None
+
+
+def get_encoder():
+    """
+    Returns the TenantEncoder compiled from 'metadata.xlsx' (compiled once
+    per process; the compiled schema is cached in the store directory).
+    """
+    global _encoder
+    if _encoder is None:
+        _encoder = load_encoder(METADATA_PATH, cache_dir=STORE_DIR)
+    return _encoder
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def schema_fingerprint():
+    """
+    Returns a hash of the encoding schema, so a change to metadata.xlsx or
+    to the encoding code invalidates stores built with the previous one.
+    """
+    key = f"{SCHEMA_VERSION}:{get_encoder().fingerprint}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------
+# ENCODER
+# -------------------------------------------------------------
+
+class SchemaAccumulator:
+    """
+    Learns the data-dependent part of the encoding (per-column min/max)
+    from one or more chunks of raw rows, so the schema of a dataset larger
+    than RAM can be fitted in one streaming pass.
+    """
+
+    def __init__(self):
+        encoder = get_encoder()
+        self.n_rows = 0
+        self.columns = encoder.columns
+        self.categories = encoder.categories
+        self.data_min = np.full(len(self.columns), np.inf)
+        self.data_max = np.full(len(self.columns), -np.inf)
+        self.problems = []
+
+    def update(self, df_chunk):
+        self.n_rows += len(df_chunk)
+        self.problems += get_encoder().validate(df_chunk)
+
+        raw = encode_raw(df_chunk)
+        if len(raw):
+            self.data_min = np.fmin(self.data_min, np.nanmin(raw, axis=0))
+            self.data_max = np.fmax(self.data_max, np.nanmax(raw, axis=0))
+
+    def finalize(self):
+        """
+        Returns:
+        - Dict with "columns", "categories", "data_min" and "data_max"
+        """
+        return {
+            "columns": self.columns,
+            "categories": self.categories,
+            "data_min": np.where(np.isfinite(self.data_min), self.data_min, 0.0).tolist(),
+            "data_max": np.where(np.isfinite(self.data_max), self.data_max, 0.0).tolist(),
+        }
+
+
+def fit_schema(df_raw):
+    """
+    Learns the data-dependent part of the encoding: the min/max of every
+    encoded column (the columns themselves come from metadata.xlsx).
+
+    Returns:
+    - Dict with "columns", "categories", "data_min" and "data_max"
+    """
+    accumulator = SchemaAccumulator()
+    accumulator.update(df_raw)
+    return accumulator.finalize()
+
+
+def encode_raw(df_rows):
+    """
+    Encodes raw rows into unscaled features with the compiled schema
+    (see schema.TenantEncoder for the column layout).
+    """
+    return get_encoder().encode(df_rows)
+
+
+def scale_raw(raw, schema):
+    """
+    Min-max scales encoded features with the schema's bounds
+    (constant columns scale to 0, as with MinMaxScaler).
+    """
+    data_min = np.asarray(schema["data_min"])
+    data_range = np.asarray(schema["data_max"]) - data_min
+    return (raw - data_min) / np.where(data_range == 0, 1.0, data_range)
+
+
+def validate_rows(df_rows):
+    """
+    Checks raw rows against metadata.xlsx.
+
+    Returns:
+    - List of human-readable problems (empty if all rows are valid)
+    """
+    return get_encoder().validate(df_rows)
+
+
+def bounds_violations(raw, schema):
+    """
+    Lists the columns where encoded rows fall outside the schema's min/max
+    bounds, which would move the scaling of every existing row.
+    """
+    below = raw < np.asarray(schema["data_min"])
+    above = raw > np.asarray(schema["data_max"])
+    return [f"'{schema['columns'][j]}' outside its min/max bounds"
+            for j in np.flatnonzero((below | above).any(axis=0))]
+
+
+def bound_hits(scaled, schema):
+    """
+    Counts, per column, the rows sitting on the schema's min / max bound
+    (scaled 0 / 1; rows of a constant column sit on both). A bound stays
+    tight as long as its count is positive, so ingestion can tell whether
+    removing or changing rows shrinks it from the changed rows alone.
+
+    Returns:
+    - Tuple (at_min, at_max) of int64 arrays (n_columns,)
+    """
+    scaled = np.asarray(scaled).reshape(-1, len(schema["columns"]))
+    constant = np.asarray(schema["data_max"]) == np.asarray(schema["data_min"])
+    at_min = np.count_nonzero(scaled <= BOUND_TOLERANCE, axis=0)
+    at_max = np.where(constant, len(scaled), np.count_nonzero(scaled >= 1 - BOUND_TOLERANCE, axis=0))
+    return at_min.astype(np.int64), at_max.astype(np.int64)
+
+
+def normalize_rows(scaled):
+    """
+    Splits scaled rows into L2-normalized float32 rows and their norms.
+    """
+    norms = np.linalg.norm(scaled, axis=1)
+    normalized = scaled / np.where(norms == 0, 1.0, norms)[:, None]
+    return np.ascontiguousarray(normalized, dtype=np.float32), norms.astype(np.float32)
+
+
+# -------------------------------------------------------------
+# FEATURE STORE
+# -------------------------------------------------------------
+
+class FeatureStore:
+    """
+    Read-only view of a built feature store.
+
+    Attributes:
+    - matrix: memory-mapped float32 array (n_tenants x n_features), rows L2-normalized
+    - norms: float32 array with the L2 norm of each scaled row before normalization
+    - ids: int64 array with the tenant ID of each row
+    - columns: list of encoded feature names
+    - schema: vocabularies and min/max bounds used to encode the rows (see fit_schema)
+    - version: fingerprint of the raw dataset + encoding schema
+    """
+
+    def __init__(self, store_dir, manifest):
+        self.store_dir = store_dir
+        self.manifest = manifest
+        self.columns = manifest["columns"]
+        self.schema = manifest["schema"]
+        self.version = manifest["version"]
+
+        shape = (manifest["n_rows"], len(self.columns))
+        self.matrix = np.memmap(os.path.join(store_dir, MATRIX_FILE), dtype=np.float32,
+                                mode="r", shape=shape)
+        self.norms = np.memmap(os.path.join(store_dir, NORMS_FILE), dtype=np.float32,
+                               mode="r", shape=(shape[0],))
+        self.ids = np.memmap(os.path.join(store_dir, IDS_FILE), dtype=np.int64,
+                             mode="r", shape=(shape[0],))
+
+        self._id_order = None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def rows_for_ids(self, tenant_ids):
+        """
+        Maps tenant IDs to matrix rows (IDs are not assumed to be row + 1).
+
+        Returns:
+        - int64 array of rows, -1 for unknown IDs
+        """
+        if self._id_order is None:
+            self._id_order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = np.asarray(self.ids)[self._id_order]
+
+        tenant_ids = np.asarray(tenant_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(len(tenant_ids), -1, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self._sorted_ids, tenant_ids), len(self._sorted_ids) - 1)
+        known = self._sorted_ids[positions] == tenant_ids
+        return np.where(known, self._id_order[positions], -1).astype(np.int64)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def invalidate_manifest(store_dir):
+    """
+    Removes the manifest before the matrix files are replaced, so a reader
+    loading in between finds no store (and rebuilds) instead of mapping
+    the new files with the old row count.
+    """
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_manifest(store_dir, raw_path, schema, n_rows, bound_counts=None):
+    """
+    Fingerprints the raw CSV and atomically writes the manifest describing
+    the matrices currently in 'store_dir'. Always called after the matrix
+    files are complete.
+
+    'bound_counts' is the (at_min, at_max) pair of bound_hits over all rows.
+
+    Returns:
+    - FeatureStore reading the new manifest
+    """
+    raw_hash = file_fingerprint(raw_path)
+    schema_hash = schema_fingerprint()
+    stat = os.stat(raw_path)
+    manifest = {
+        "version": hashlib.sha256(f"{raw_hash}:{schema_hash}".encode("utf-8")).hexdigest()[:16],
+        "raw_hash": raw_hash,
+        "raw_size": stat.st_size,
+        "raw_mtime_ns": stat.st_mtime_ns,
+        "schema_hash": schema_hash,
+        "n_rows": int(n_rows),
+        "columns": schema["columns"],
+        "schema": schema,
+    }
+    if bound_counts is not None:
+        manifest["bound_counts"] = {"min": np.asarray(bound_counts[0]).tolist(),
+                                    "max": np.asarray(bound_counts[1]).tolist()}
+    _write_atomic(os.path.join(store_dir, MANIFEST_FILE),
+                  json.dumps(manifest, indent=2).encode("utf-8"))
+    return FeatureStore(store_dir, manifest)
+
+
+def build_feature_store(raw_path=RAW_PATH, store_dir=STORE_DIR, chunksize=CHUNKSIZE):
+    """
+    Encodes the raw dataset and writes the feature store to 'store_dir'.
+
+    Runs in two streaming passes over the CSV, so peak memory depends on
+    'chunksize', not on the number of tenants:
+    1. Fit the schema (vocabularies, min/max) chunk by chunk.
+    2. Encode each chunk with that fixed schema straight into preallocated
+       memory-mapped output files.
+
+    The old manifest is removed before the finished files are moved into
+    place and the new one is written last, so a crashed or concurrent
+    build never leaves a manifest describing other matrices.
+
+    Returns:
+    - FeatureStore for the freshly built store
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    # Pass 1: schema
+    accumulator = SchemaAccumulator()
+    for df_chunk in pd.read_csv(raw_path, chunksize=chunksize):
+        accumulator.update(df_chunk)
+    schema = accumulator.finalize()
+    if accumulator.problems:
+        print(f"⚠️ Raw dataset does not match metadata.xlsx: {'; '.join(sorted(set(accumulator.problems)))}")
+    n_rows, n_cols = accumulator.n_rows, len(schema["columns"])
+
+    # Pass 2: encode into preallocated outputs
+    tmp = lambda name: os.path.join(store_dir, f"{name}.{os.getpid()}.tmp")
+    outputs = {
+        MATRIX_FILE: np.memmap(tmp(MATRIX_FILE), dtype=np.float32, mode="w+", shape=(max(n_rows, 1), n_cols)),
+        NORMS_FILE: np.memmap(tmp(NORMS_FILE), dtype=np.float32, mode="w+", shape=(max(n_rows, 1),)),
+        IDS_FILE: np.memmap(tmp(IDS_FILE), dtype=np.int64, mode="w+", shape=(max(n_rows, 1),)),
+    }
+
+    start = 0
+    at_min, at_max = np.zeros(n_cols, dtype=np.int64), np.zeros(n_cols, dtype=np.int64)
+    for df_chunk in pd.read_csv(raw_path, chunksize=chunksize):
+        stop = start + len(df_chunk)
+        scaled = scale_raw(encode_raw(df_chunk), schema)
+        chunk_min, chunk_max = bound_hits(scaled, schema)
+        at_min += chunk_min
+        at_max += chunk_max
+        outputs[MATRIX_FILE][start:stop], outputs[NORMS_FILE][start:stop] = normalize_rows(scaled)
+        outputs[IDS_FILE][start:stop] = df_chunk['id_tenant'].to_numpy(dtype=np.int64)
+        start = stop
+
+    for output in outputs.values():
+        output.flush()
+    names = list(outputs)
+    outputs.clear()  # Release the memory maps before moving the files
+    invalidate_manifest(store_dir)
+    for name in names:
+        os.replace(tmp(name), os.path.join(store_dir, name))
+
+    return write_manifest(store_dir, raw_path, schema, n_rows, (at_min, at_max))
+
+
+def is_store_fresh(manifest, raw_path=RAW_PATH):
+    """
+    Checks whether a manifest still matches the raw dataset and encoding schema.
+    File size and mtime are compared first so an untouched CSV is never re-hashed.
+    """
+    if manifest is None or "schema" not in manifest or manifest.get("schema_hash") != schema_fingerprint():
+        return False
+
+    stat = os.stat(raw_path)
+    if stat.st_size == manifest.get("raw_size") and stat.st_mtime_ns == manifest.get("raw_mtime_ns"):
+        return True
+    return file_fingerprint(raw_path) == manifest.get("raw_hash")
+
+
+def load_feature_store(raw_path=RAW_PATH, store_dir=STORE_DIR, force=False):
+    """
+    Memory-maps the feature store, rebuilding it first if it is missing,
+    stale (raw CSV or encoding schema changed) or if 'force' is True.
+
+    Parameters:
+    - raw_path: Path to the raw tenant CSV
+    - store_dir: Directory holding the binary matrices and manifest
+    - force: If True, rebuilds even if the store is fresh
+
+    Returns:
+    - FeatureStore
+    """
+    manifest = _read_manifest(store_dir)
+
+    if force or not is_store_fresh(manifest, raw_path):
+        print("⚙️ Building feature store...")
+        store = build_feature_store(raw_path, store_dir)
+        print(f"✅ Feature store saved in '{store_dir}/' (version {store.version}).")
+        return store
+
+    return FeatureStore(store_dir, manifest)
+
+
+# -------------------------------------------------------------
+# DERIVED ARTIFACTS
+# -------------------------------------------------------------
+#
+# Structures built offline from the store (kNN graph, IVF index, compact
+# matrix) are saved next to it as raw array files plus a manifest tagged
+# with the store version, so they are ignored once the store changes.
+
+def save_artifact(store, manifest_file, arrays, **fields):
+    """
+    Writes derived arrays next to the feature store, tagged with its version.
+
+    The previous manifest is removed first and every file is written to a
+    temporary path and moved into place, so an interrupted save (e.g. a
+    rebuild with another size) never leaves a manifest describing files of
+    a different shape, and readers of the old files keep their mapping.
+
+    Parameters:
+    - store: FeatureStore the arrays were built from
+    - manifest_file: Manifest file name
+    - arrays: Dict file name -> NumPy array
+    - fields: Extra manifest entries (shapes, build options)
+    """
+    manifest_path = os.path.join(store.store_dir, manifest_file)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    for name, array in arrays.items():
+        path = os.path.join(store.store_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        np.ascontiguousarray(array).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    manifest = {"version": store.version, **fields}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+
+def load_artifact_manifest(store, manifest_file):
+    """
+    Returns:
+    - The manifest saved with save_artifact, or None if it is missing or
+      belongs to another store version / row count
+    """
+    try:
+        with open(os.path.join(store.store_dir, manifest_file), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != store.version or manifest.get("n_rows") != len(store):
+        return None
+    return manifest
@@ -0,0 +1,283 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import (
+    IDS_FILE, MATRIX_FILE, NORMS_FILE, RAW_PATH, STORE_DIR,
+    bound_hits, bounds_violations, build_feature_store, encode_raw, invalidate_manifest,
+    load_feature_store, normalize_rows, scale_raw, validate_rows, write_manifest
+)
+
+# -------------------------------------------------------------
+# INCREMENTAL TENANT INGESTION
+# -------------------------------------------------------------
+#
+# New, changed or removed tenants are encoded against the schema persisted
+# in the feature store manifest (category vocabularies + min/max bounds),
+# so only the affected rows are encoded. The raw CSV stays the source of
+# truth and is kept in the same row order as the store.
+#
+# Rows that do not match metadata.xlsx are rejected. A full rebuild
+# (rebalance) only happens when a min/max bound moves, which would change
+# the scaling of every existing row. The manifest keeps, per column, the
+# number of rows sitting on each bound, so whether a bound shrinks is known
+# from the changed rows alone; unchanged rows of the CSV are copied as
+# bytes, without parsing.
+#
+# Ingestion assumes a single writer process; readers pick up the new data
+# when they reload the store (its version changes with the CSV fingerprint).
+
+def _csv_columns(raw_path):
+    return pd.read_csv(raw_path, nrows=0).columns.tolist()
+
+
+def _prepare_rows(df_rows, raw_path):
+    # "None" / "" mean a missing answer, as when pandas reads the CSV
+    df_rows = df_rows.replace({"None": np.nan, "": np.nan})
+    missing = [col for col in _csv_columns(raw_path) if col not in df_rows.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    df_rows = df_rows[_csv_columns(raw_path)]
+
+    problems = validate_rows(df_rows)
+    if problems:
+        raise ValueError(f"Invalid tenant rows: {'; '.join(problems)}")
+    return df_rows
+
+
+def _append_csv(df_rows, raw_path):
+    with open(raw_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    df_rows.to_csv(raw_path, mode="a", header=False, index=False, na_rep="None")
+
+
+def _rewrite_csv(raw_path, replaced=None, dropped=()):
+    """
+    Copies the raw CSV line by line, replacing ('replaced': data row ->
+    CSV line) or dropping data rows by position. Values come from
+    metadata.xlsx, so no field spans several lines.
+    """
+    replaced = replaced or {}
+    dropped = set(int(row) for row in dropped)
+    tmp_path = f"{raw_path}.{os.getpid()}.tmp"
+    with open(raw_path, "rb") as src, open(tmp_path, "wb") as dst:
+        dst.write(src.readline())  # Header
+        for row, line in enumerate(src):
+            if row in dropped:
+                continue
+            if row in replaced:
+                line = replaced[row]
+            elif not line.endswith(b"\n"):
+                line += b"\n"
+            dst.write(line)
+    os.replace(tmp_path, raw_path)
+
+
+def _csv_lines(df_rows):
+    text = df_rows.to_csv(header=False, index=False, na_rep="None", lineterminator="\n")
+    return [line.encode("utf-8") for line in text.splitlines(keepends=True)]
+
+
+def _stored_scaled(store, rows):
+    # Scaled rows as stored (normalized row x norm)
+    return np.asarray(store.matrix[rows], dtype=np.float64) * np.asarray(store.norms[rows], dtype=np.float64)[:, None]
+
+
+def _bound_counts(store, block_size=1 << 16):
+    """
+    Rows on each min / max bound per column, from the manifest (stores
+    built before the counts were recorded are counted once, in one pass).
+    """
+    counts = store.manifest.get("bound_counts")
+    if counts is not None:
+        return np.asarray(counts["min"], dtype=np.int64), np.asarray(counts["max"], dtype=np.int64)
+
+    at_min = np.zeros(len(store.columns), dtype=np.int64)
+    at_max = np.zeros(len(store.columns), dtype=np.int64)
+    for start in range(0, len(store), block_size):
+        block_min, block_max = bound_hits(_stored_scaled(store, slice(start, start + block_size)), store.schema)
+        at_min += block_min
+        at_max += block_max
+    return at_min, at_max
+
+
+def _updated_counts(store, removed_rows, new_scaled=None):
+    """
+    Bound counts once 'removed_rows' are gone and 'new_scaled' rows are
+    added, computed from those rows only.
+
+    Returns:
+    - Tuple ((at_min, at_max), holds): holds is False if a bound shrinks
+      (some column no longer has a row on it)
+    """
+    at_min, at_max = _bound_counts(store)
+    removed_min, removed_max = bound_hits(_stored_scaled(store, removed_rows), store.schema)
+    at_min, at_max = at_min - removed_min, at_max - removed_max
+    if new_scaled is not None:
+        new_min, new_max = bound_hits(new_scaled, store.schema)
+        at_min, at_max = at_min + new_min, at_max + new_max
+    return (at_min, at_max), bool((at_min > 0).all() and (at_max > 0).all())
+
+
+def _truncate(store_dir, n_rows, n_cols):
+    # Drop bytes past the manifest's row count left by an interrupted append
+    os.truncate(os.path.join(store_dir, MATRIX_FILE), n_rows * n_cols * 4)
+    os.truncate(os.path.join(store_dir, NORMS_FILE), n_rows * 4)
+    os.truncate(os.path.join(store_dir, IDS_FILE), n_rows * 8)
+
+
+def _rebalance(raw_path, store_dir, reasons):
+    print(f"⚙️ Full rebuild needed ({'; '.join(reasons)}).")
+    return build_feature_store(raw_path, store_dir)
+
+
+def add_tenants(df_new, raw_path=RAW_PATH, store_dir=STORE_DIR):
+    """
+    Appends new tenants to the raw CSV and the feature store.
+
+    Parameters:
+    - df_new: DataFrame with the raw CSV columns; 'id_tenant' may be omitted
+      (new IDs are then assigned after the current maximum)
+
+    Returns:
+    - FeatureStore including the new tenants
+
+    Raises:
+    - ValueError if rows do not match metadata.xlsx or IDs already exist
+    """
+    store = load_feature_store(raw_path, store_dir)
+    df_new = df_new.copy()
+    if "id_tenant" not in df_new.columns or df_new["id_tenant"].isna().any():
+        next_id = int(np.max(store.ids)) + 1 if len(store) else 1
+        df_new["id_tenant"] = np.arange(next_id, next_id + len(df_new))
+    df_new = _prepare_rows(df_new, raw_path)
+
+    new_ids = df_new["id_tenant"].to_numpy(dtype=np.int64)
+    if (store.rows_for_ids(new_ids) >= 0).any() or len(np.unique(new_ids)) != len(new_ids):
+        raise ValueError("Tenant IDs already exist or are duplicated.")
+
+    schema = store.schema
+    raw = encode_raw(df_new)
+    reasons = bounds_violations(raw, schema)
+
+    _append_csv(df_new, raw_path)
+    if reasons:
+        return _rebalance(raw_path, store_dir, reasons)
+
+    scaled = scale_raw(raw, schema)
+    counts, _ = _updated_counts(store, np.zeros(0, dtype=np.int64), scaled)
+    normalized, norms = normalize_rows(scaled)
+    _truncate(store_dir, len(store), len(schema["columns"]))
+    with open(os.path.join(store_dir, MATRIX_FILE), "ab") as f:
+        f.write(normalized.tobytes())
+    with open(os.path.join(store_dir, NORMS_FILE), "ab") as f:
+        f.write(norms.tobytes())
+    with open(os.path.join(store_dir, IDS_FILE), "ab") as f:
+        f.write(new_ids.tobytes())
+
+    return write_manifest(store_dir, raw_path, schema, len(store) + len(df_new), counts)
+
+
+def update_tenants(df_changed, raw_path=RAW_PATH, store_dir=STORE_DIR):
+    """
+    Replaces the profiles of existing tenants (matched on 'id_tenant').
+
+    Returns:
+    - FeatureStore with the updated rows
+
+    Raises:
+    - ValueError if rows do not match metadata.xlsx or an ID does not exist
+    """
+    store = load_feature_store(raw_path, store_dir)
+    df_changed = _prepare_rows(df_changed, raw_path)
+    rows = store.rows_for_ids(df_changed["id_tenant"])
+    if (rows < 0).any():
+        raise ValueError("One or more tenant IDs do not exist.")
+    if len(np.unique(rows)) != len(rows):
+        raise ValueError("Tenant IDs are duplicated.")
+
+    schema = store.schema
+    raw = encode_raw(df_changed)
+    reasons = bounds_violations(raw, schema)
+    scaled = None if reasons else scale_raw(raw, schema)
+    if scaled is not None:
+        counts, holds = _updated_counts(store, rows, scaled)
+        if not holds:
+            reasons = ["min/max bounds shrink"]
+
+    _rewrite_csv(raw_path, replaced=dict(zip(rows.tolist(), _csv_lines(df_changed))))
+    if reasons:
+        return _rebalance(raw_path, store_dir, reasons)
+
+    normalized, norms = normalize_rows(scaled)
+    n_rows, n_cols = len(store), len(schema["columns"])
+    matrix = np.memmap(os.path.join(store_dir, MATRIX_FILE), dtype=np.float32, mode="r+", shape=(n_rows, n_cols))
+    matrix[rows] = normalized
+    matrix.flush()
+    norms_file = np.memmap(os.path.join(store_dir, NORMS_FILE), dtype=np.float32, mode="r+", shape=(n_rows,))
+    norms_file[rows] = norms
+    norms_file.flush()
+
+    return write_manifest(store_dir, raw_path, schema, n_rows, counts)
+
+
+def remove_tenants(tenant_ids, raw_path=RAW_PATH, store_dir=STORE_DIR):
+    """
+    Removes tenants from the raw CSV and the feature store. Remaining rows
+    keep their encoding; the id -> row mapping is rebuilt from the stored IDs.
+
+    Returns:
+    - FeatureStore without the removed tenants
+
+    Raises:
+    - ValueError if an ID does not exist
+    """
+    store = load_feature_store(raw_path, store_dir)
+    rows = store.rows_for_ids(tenant_ids)
+    if (rows < 0).any():
+        raise ValueError("One or more tenant IDs do not exist.")
+    rows = np.unique(rows)
+
+    counts, bounds_hold = _updated_counts(store, rows)
+
+    _rewrite_csv(raw_path, dropped=rows)
+    if not bounds_hold:
+        return _rebalance(raw_path, store_dir, ["min/max bounds shrink"])
+
+    keep = np.ones(len(store), dtype=bool)
+    keep[rows] = False
+    invalidate_manifest(store_dir)
+    for name, values in ((MATRIX_FILE, store.matrix), (NORMS_FILE, store.norms), (IDS_FILE, store.ids)):
+        path = os.path.join(store_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        np.ascontiguousarray(values[keep]).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    return write_manifest(store_dir, raw_path, store.schema, int(keep.sum()), counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add, update or remove tenants without a full rebuild.")
+    parser.add_argument("command", choices=["add", "update", "remove"])
+    parser.add_argument("items", nargs="+", help="CSV file(s) for add/update, tenant IDs for remove")
+    parser.add_argument("--raw", default=RAW_PATH, help="Raw tenant CSV")
+    parser.add_argument("--store", default=STORE_DIR, help="Feature store directory")
+    args = parser.parse_args()
+
+    if args.command == "remove":
+        store = remove_tenants([int(i) for i in args.items], args.raw, args.store)
+    else:
+        df_rows = pd.concat([pd.read_csv(path) for path in args.items], ignore_index=True)
+        ingest = add_tenants if args.command == "add" else update_tenants
+        store = ingest(df_rows, args.raw, args.store)
+    print(f"✅ Feature store has {len(store)} tenants (version {store.version}).")
+
+
+if __name__ == "__main__":
+    main()
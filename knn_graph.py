@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from feature_store import RAW_PATH, STORE_DIR, load_artifact_manifest, load_feature_store, save_artifact
+from search import top_k_rows
+
+# -------------------------------------------------------------
+# ALL-PAIRS K-NEAREST-NEIGHBOUR GRAPH
+# -------------------------------------------------------------
+
+NEIGHBORS_FILE = "knn_neighbors.i32"
+SCORES_FILE = "knn_scores.f32"
+GRAPH_MANIFEST_FILE = "knn_manifest.json"
+
+# Slack for float32 rounding between the graph build and query-time dot products
+SCORE_EPSILON = 1e-5
+
+
+def build_knn_graph(matrix, k=50, block_size=None, n_jobs=None):
+    """
+    Computes the top-K neighbours of every row of an L2-normalized matrix.
+
+    Rows are processed in blocks (block x n matrix multiply + row-wise
+    argpartition) spread over a thread pool; NumPy releases the GIL in both.
+    Peak extra memory is about n_jobs * block_size * n * 4 bytes.
+
+    Parameters:
+    - matrix: L2-normalized float32 matrix (n x d), e.g. FeatureStore.matrix
+    - k: Neighbours kept per row (self excluded)
+    - block_size: Rows per block (default keeps each block around 64 MB)
+    - n_jobs: Worker threads (default: all cores)
+
+    Returns:
+    - Tuple (neighbors, scores): int32 and float32 arrays of shape (n x k), best first
+    """
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if block_size is None:
+        block_size = max(1, (1 << 24) // n)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    def process(start):
+        stop = min(start + block_size, n)
+        block_scores = matrix[start:stop] @ matrix.T
+        block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Exclude self
+        rows, values = top_k_rows(block_scores, k)
+        neighbors[start:stop] = rows
+        scores[start:stop] = values
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        list(pool.map(process, range(0, n, block_size)))
+
+    return neighbors, scores
+
+
+class KnnGraph:
+    """
+    Persisted kNN graph: neighbors[i] are the rows most similar to row i
+    and scores[i] their cosine similarities, best first.
+    """
+
+    def __init__(self, neighbors, scores):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.k = neighbors.shape[1]
+
+    def search(self, matrix, seed_rows, top_n, mask=None):
+        """
+        Answers a (multi-)seed query from the seeds' neighbour lists.
+
+        Any tenant outside every seed's list scores at most the k-th
+        neighbour score of each seed, so the candidate answer is exact
+        whenever its top_n-th score beats the mean of those bounds.
+
+        Parameters:
+        - matrix: The L2-normalized matrix the graph was built from
+        - seed_rows: Seed row indices (0-based); repeated rows weigh more
+        - top_n: Number of results
+        - mask: Optional boolean mask of qualifying rows
+
+        Returns:
+        - Tuple (rows, scores), best first, or None if the neighbour lists
+          cannot prove the answer (caller should fall back to an exact pass)
+        """
+        # Repeated seeds are kept: they weigh more in the centroid, as in the exact pass
+        seed_rows = np.asarray(seed_rows, dtype=np.int64)
+        if top_n > self.k:
+            return None
+
+        # Single seed (possibly repeated) without filters: plain table lookup
+        if mask is None and (seed_rows == seed_rows[0]).all():
+            return self.neighbors[seed_rows[0], :top_n].astype(np.int64), self.scores[seed_rows[0], :top_n]
+
+        candidates = np.unique(self.neighbors[seed_rows].ravel()).astype(np.int64)
+        candidates = candidates[~np.isin(candidates, seed_rows)]
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if len(candidates) < top_n:
+            return None
+
+        centroid = matrix[seed_rows].astype(np.float32).mean(axis=0)
+        candidate_scores = matrix[candidates] @ centroid
+        top, values = top_k_rows(candidate_scores[None, :], top_n)
+
+        bound = self.scores[seed_rows, -1].mean()
+        if values[0, -1] <= bound + SCORE_EPSILON:
+            return None
+        return candidates[top[0]], values[0]
+
+    def reciprocal_matches(self, row, top_n=None):
+        """
+        Neighbours of 'row' that also list 'row' among their own neighbours.
+
+        The reciprocal score is 2 / (rank_ab + rank_ba + 2) with 0-based ranks,
+        so 1.0 means both tenants are each other's best match.
+
+        Returns:
+        - Dict of arrays: rows, similarity, rank (row -> match),
+          reverse_rank (match -> row) and reciprocal_score, sorted by
+          reciprocal_score descending
+        """
+        forward = self.neighbors[row].astype(np.int64)
+        hits = self.neighbors[forward] == row
+        mutual = hits.any(axis=1)
+
+        rank = np.flatnonzero(mutual)
+        reverse_rank = hits[mutual].argmax(axis=1)
+        reciprocal = 2.0 / (rank + reverse_rank + 2)
+
+        order = np.argsort(-reciprocal, kind="stable")[:top_n]
+        return {
+            "rows": forward[mutual][order],
+            "similarity": self.scores[row][mutual][order],
+            "rank": rank[order],
+            "reverse_rank": reverse_rank[order],
+            "reciprocal_score": reciprocal[order],
+        }
+
+
+# -------------------------------------------------------------
+# PERSISTENCE
+# -------------------------------------------------------------
+
+def save_knn_graph(store, neighbors, scores):
+    """
+    Writes the graph next to the feature store, tagged with its version.
+    """
+    save_artifact(store, GRAPH_MANIFEST_FILE, {NEIGHBORS_FILE: neighbors, SCORES_FILE: scores},
+                  n_rows=int(neighbors.shape[0]), k=int(neighbors.shape[1]))
+
+
+def load_knn_graph(store):
+    """
+    Memory-maps the graph built for this feature store.
+
+    Returns:
+    - KnnGraph, or None if no graph was built or it belongs to an older store version
+    """
+    manifest = load_artifact_manifest(store, GRAPH_MANIFEST_FILE)
+    if manifest is None:
+        return None
+
+    shape = (manifest["n_rows"], manifest["k"])
+    neighbors = np.memmap(os.path.join(store.store_dir, NEIGHBORS_FILE), dtype=np.int32, mode="r", shape=shape)
+    scores = np.memmap(os.path.join(store.store_dir, SCORES_FILE), dtype=np.float32, mode="r", shape=shape)
+    return KnnGraph(neighbors, scores)
+
+
+# -------------------------------------------------------------
+# OFFLINE BUILD STEP
+# -------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the all-pairs kNN graph for the feature store.")
+    parser.add_argument("--k", type=int, default=50, help="Neighbours kept per tenant")
+    parser.add_argument("--block-size", type=int, default=None, help="Rows per matrix-multiply block")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker threads (default: all cores)")
+    parser.add_argument("--raw", default=RAW_PATH, help="Raw tenant CSV")
+    parser.add_argument("--store", default=STORE_DIR, help="Feature store directory")
+    args = parser.parse_args()
+
+    store = load_feature_store(args.raw, args.store)
+    start = time.perf_counter()
+    neighbors, scores = build_knn_graph(store.matrix, args.k, args.block_size, args.jobs)
+    save_knn_graph(store, neighbors, scores)
+    print(f"✅ kNN graph (k={neighbors.shape[1]}) for {len(store)} tenants built in "
+          f"{time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
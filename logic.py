@@ -1,125 +1,505 @@
+import threading
 
 import numpy as np
 import pandas as pd
-import os
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics.pairwise import cosine_similarity
+from ann_index import IVFIndex
+from attribute_index import AttributeIndex, Bitmap
+from compact_matrix import load_or_build_compact
+from explanations import attribute_aggregation, contribution_breakdown
+from feature_store import RAW_PATH, get_encoder, load_feature_store
+from knn_graph import load_knn_graph
+from profile_store import ProfileStore
+from profiling import span
+from result_cache import ResultCache, filters_key
+from search import ExactSearch, ShardedExactSearch
+from weights import WeightedBackendCache, column_weights, weights_key
 
 # -------------------------------------------------------------
-# AUTO-UPDATER FOR NORMALIZED DATASET
+# FEATURE STORE LOADER
 # -------------------------------------------------------------
 
 def update_normalized_dataset(force=False):
     """
-    Checks if the normalized dataset exists. If not, or if 'force' is True,
-    it regenerates it from the original dataset.
+    Loads the encoded, L2-normalized feature matrix from the binary feature
+    store, rebuilding it when it is missing or stale (the raw CSV or the
+    encoding schema changed).
 
     Parameters:
-    - force: If True, regenerates even if the file exists.
+    - force: If True, rebuilds even if the store is up to date.
+
+    Returns:
+    - FeatureStore (see feature_store.py)
+    """
+    return load_feature_store(force=force)
+
+# -------------------------------------------------------------
+# DATASET RESOURCE
+# -------------------------------------------------------------
+#
+# Importing this module does no I/O. The dataset (feature store, raw
+# profiles, indexes) is loaded once per process, on first use or by an
+# explicit ensure_loaded() call, e.g. from the app's st.cache_resource
+# loader. Reading one of the globals below from outside the module, as in
+# `from logic import df_raw`, also triggers the load.
+
+DATASET_GLOBALS = (
+    "store", "feature_matrix", "profiles", "df_raw", "knn_graph", "attribute_index",
+    "search_backend", "explanation_attributes", "explanation_aggregation",
+)
+
+_load_lock = threading.RLock()
+_loaded = False
+
+
+def ensure_loaded():
+    """
+    Loads the dataset if this process has not loaded it yet (thread-safe).
+    """
+    if not _loaded:
+        with _load_lock:
+            if not _loaded:
+                reload_dataset()
+
+
+def __getattr__(name):
+    if name in DATASET_GLOBALS:
+        ensure_loaded()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def reload_dataset(force=False):
+    """
+    (Re)loads the feature store, raw profiles and derived indexes into the
+    module globals, e.g. after tenants were ingested with ingest.py.
+    """
+    global _loaded
+
+    with _load_lock:
+        _reload_dataset(force)
+        _loaded = True
+
+
+def _reload_dataset(force):
+    global store, feature_matrix, profiles, df_raw, knn_graph, attribute_index, search_backend
+    global explanation_attributes, explanation_aggregation
+
+    # Ensure the feature store is available before anything else
+    store = update_normalized_dataset(force)
+
+    # Memory-mapped matrix (rows already L2-normalized) and compact raw
+    # profiles (categoricals + id -> row table), both in the same row order
+    feature_matrix = store.matrix
+    profiles = ProfileStore.from_csv(RAW_PATH)
+    df_raw = profiles.frame
+
+    # Precomputed kNN graph (built offline with `python knn_graph.py`), if any
+    knn_graph = load_knn_graph(store)
+
+    # Bitmap / range index over raw attributes for hard-constraint filters
+    attribute_index = AttributeIndex(df_raw)
+
+    # Encoded column -> raw attribute mapping used to explain scores
+    explanation_attributes, explanation_aggregation = attribute_aggregation(store.columns, get_encoder().sources)
+
+    # Backend used to score seed groups against all tenants: the one selected
+    # with use_search_backend, rebuilt over the new matrix
+    name, options = _backend_choice
+    try:
+        backend = _make_backend(name, options)
+    except ValueError as e:
+        print(f"⚠️ {e} Falling back to the exact backend.")
+        backend = ExactSearch(feature_matrix)
+    previous, search_backend = globals().get("search_backend"), backend
+    if hasattr(previous, "close"):
+        previous.close()
+
+    # Cached results and weighted matrices of an older dataset version are dropped
+    result_cache.bind(store.version)
+    weighted_backends.bind(store.version)
+
+
+# Search backend selected with use_search_backend, as (name, options)
+_backend_choice = ("exact", {})
+
+# Match results shared by all reruns / sessions of the process (see result_cache.py)
+result_cache = ResultCache()
+
+# Backends of weight profiles / custom weights (see weights.py)
+weighted_backends = WeightedBackendCache()
+
+
+def use_search_backend(name="exact", **options):
+    """
+    Selects the search backend used by compatible_tenants(_batch).
+
+    Parameters:
+    - name: "exact" (brute force), "sharded" (brute force split into row
+      shards scored on a thread pool, same results as "exact"), "ivf"
+      (approximate, built offline with `python ann_index.py build`) or
+      "compact" (bit-packed / quantized matrix with a popcount kernel, about
+      16x less memory than float32)
+    - options: Backend options, e.g. n_probe=16 for "ivf", n_shards /
+      workers / min_rows for "sharded"
+
+    Queries with trait weights (see resolve_weights) are supported by
+    "exact" and "sharded" only. The selection survives reload_dataset: the
+    same backend is rebuilt over the reloaded matrix (falling back to
+    "exact" if the IVF index no longer matches the store).
+
+    Returns:
+    - The selected backend
+
+    Raises:
+    - ValueError for an unknown backend or an IVF index that was not built
+    """
+    global search_backend, _backend_choice
+    ensure_loaded()
+
+    with _load_lock:
+        backend = _make_backend(name, options)
+        _backend_choice = (name, dict(options))
+
+        # Release the previous backend's resources (e.g. the sharded thread pool)
+        previous, search_backend = search_backend, backend
+        if hasattr(previous, "close"):
+            previous.close()
+        result_cache.clear()
+    return backend
+
+
+def _make_backend(name, options):
+    # Builds a search backend over the currently loaded dataset
+    if name == "exact":
+        return ExactSearch(feature_matrix, **options)
+    if name == "sharded":
+        return ShardedExactSearch(feature_matrix, **options)
+    if name == "ivf":
+        backend = IVFIndex.load(store, **options)
+        if backend is None:
+            raise ValueError("No IVF index for this feature store. Run `python ann_index.py build` first.")
+        return backend
+    if name == "compact":
+        return load_or_build_compact(store)
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+def cache_stats():
+    """Hit / miss / eviction counters of the match result cache."""
+    return result_cache.stats()
+
+
+def resolve_weights(weights):
+    """
+    Search backend for trait weights (see weights.py).
+
+    Parameters:
+    - weights: None, a profile name (e.g., "quiet_home"), a dict
+      attribute -> weight or an array of attribute / column weights
+
+    Returns:
+    - Tuple (backend, key): the current search backend and "" when
+      unweighted, otherwise the cached weighted backend and its cache key.
+      With the "sharded" backend, the weighted backend is sharded the same
+      way and shares its thread pool.
+
+    Raises:
+    - ValueError for invalid weights, or when the current backend is "ivf"
+      or "compact" (weights need an exact backend)
+    """
+    ensure_loaded()
+    weights_ = column_weights(weights, explanation_attributes, explanation_aggregation)
+    if weights_ is None:
+        return search_backend, ""
+    if not isinstance(search_backend, ExactSearch):
+        raise ValueError(f"Trait weights need the 'exact' or 'sharded' search backend, "
+                         f"not '{search_backend.name}'.")
+    key = weights_key(weights, weights_)
+    backend = weighted_backends.backend(key, feature_matrix, weights_, isinstance(weights, str))
+    if isinstance(search_backend, ShardedExactSearch):
+        backend = search_backend.over(backend)
+    return backend, key
+
+
+# -------------------------------------------------------------
+# FILTERS
+# -------------------------------------------------------------
+
+@span("filter_mask")
+def build_filter_mask(filters):
     """
-    normalized_path = "normalized_encoded.csv"
-    raw_path = "tenants_dataset.csv"
+    Turns filter predicates into a boolean mask over all tenants.
 
-    if not os.path.exists(normalized_path) or force:
-        print("⚙️ Regenerating normalized dataset...")
+    Parameters:
+    - filters: Either a boolean mask, a Bitmap built with attribute_index (e.g.,
+      attribute_index.eq("smoker", "No") | ~attribute_index.eq("likes_pets", "Yes"))
+      or a dict of constraints ANDed together, e.g.
+      {"smoker": "No", "sleep_schedule": ["Flexible", "Early bird"],
+       "budget": {"min": 400, "max": 800}}; see AttributeIndex.from_filters
 
-        # Load original tenant profiles
-        df_raw = pd.read_csv(raw_path)
+    Returns:
+    - Boolean NumPy array (True = tenant qualifies), or None if no filters
+    """
+    ensure_loaded()
+    if filters is None:
+        return None
+    if isinstance(filters, np.ndarray):
+        return filters
+    if isinstance(filters, Bitmap):
+        return filters.to_mask()
+    if not filters:
+        return None
+    return attribute_index.from_filters(filters).to_mask()
 
-        # Split 'languages_spoken' into binary columns
-        all_languages = ['English', 'Spanish', 'French', 'German', 'Italian']
-        for lang in all_languages:
-            df_raw[f'lang_{lang}'] = df_raw['languages_spoken'].apply(lambda x: int(lang in x))
 
-        # Drop unused columns
-        df_raw.drop(['id_tenant', 'languages_spoken'], axis=1, inplace=True)
+# -------------------------------------------------------------
+# RESULT ASSEMBLY
+# -------------------------------------------------------------
 
-        # Categorical columns to one-hot encode
-        categorical_cols = [
-            'sleep_schedule', 'work_shift', 'energy_rhythm', 'education_level',
-            'social_level', 'cooking_preference', 'preferred_music_genre',
-            'ideal_weekend_plan', 'noise_tolerance', 'relationship_status'
-        ]
-        df_encoded = pd.get_dummies(df_raw, columns=categorical_cols)
+@span("build_result")
+def build_result(tenant_ids, top_tenant_ids, top_scores):
+    """
+    Builds the (result_df, similarities) tuple returned by compatible_tenants.
+    """
+    ensure_loaded()
+    # Seed and recommended profiles side by side, one column per tenant
+    # (gathered by row position, only these columns are decoded)
+    result_df = profiles.table(tenant_ids, top_tenant_ids)
 
-        # Convert Yes/No binary columns
-        binary_cols = [
-            'likes_reading', 'likes_cooking', 'on_diet', 'smoker', 'likes_pets',
-            'pet_allergy', 'frequent_visits', 'remote_worker', 'plays_sports',
-            'listens_loud_music', 'shares_common_items'
-        ]
-        for col in binary_cols:
-            df_encoded[col] = df_encoded[col].map({'Yes': 1, 'No': 0})
+    # Prepare similarity scores
+    similarities = pd.Series(top_scores, index=list(top_tenant_ids), name="Similarity")
 
-        # Apply MinMaxScaler
-        scaler = MinMaxScaler()
-        normalized_array = scaler.fit_transform(df_encoded)
-        df_normalized = pd.DataFrame(normalized_array, columns=df_encoded.columns)
+    return result_df, similarities
 
-        # Save to CSV
-        df_normalized.to_csv(normalized_path, index=False)
-        print("✅ Normalized dataset saved as 'normalized_encoded.csv'.")
-    else:
-        print("✅ Normalized dataset already exists.")
 
-# Ensure the normalized dataset is available before anything else
-update_normalized_dataset()
+class BatchMatchResult:
+    """
+    Compact result of compatible_tenants_batch.
 
-# Load preprocessed datasets
-df_normalized = pd.read_csv("normalized_encoded.csv")
-df_raw = pd.read_csv("tenants_dataset.csv")
+    Attributes:
+    - seed_groups: The seed groups, as passed in
+    - ids: int64 array (n_groups x top_n) of recommended tenant IDs, best first;
+      -1 marks an empty slot (fewer qualifying tenants than top_n)
+    - scores: float32 array (n_groups x top_n) of average cosine similarities
+    - counts: Number of filled slots per group
+    - vectors: Normalized rows the scores were computed on (the feature
+      matrix, or a weighted backend's vectors_for)
+
+    DataFrames are only built on request with frame(i) / frames().
+    """
+
+    def __init__(self, seed_groups, ids, scores, vectors=None):
+        self.seed_groups = seed_groups
+        self.ids = ids
+        self.scores = scores
+        self.counts = (ids >= 0).sum(axis=1)
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.seed_groups)
+
+    def frame(self, i):
+        """Returns the (result_df, similarities) tuple for group i."""
+        n = self.counts[i]
+        return build_result(self.seed_groups[i], self.ids[i, :n].tolist(), self.scores[i, :n])
+
+    def frames(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    def contributions(self):
+        """
+        Per-attribute breakdown of every score (see explanations.py).
+
+        Returns:
+        - float32 array (n_groups x top_n x n_attributes), attributes ordered
+          as logic.explanation_attributes
+        """
+        seed_rows = [store.rows_for_ids(group) for group in self.seed_groups]
+        match_rows = store.rows_for_ids(self.ids.ravel()).reshape(self.ids.shape)
+        vectors = feature_matrix if self.vectors is None else self.vectors
+        return contribution_breakdown(vectors, seed_rows, match_rows, explanation_aggregation)
+
+    def top_reasons(self, n=3):
+        """
+        Names of the n attributes contributing most to each match's score.
+
+        Returns:
+        - Nested list (n_groups x top_n) of attribute name lists, empty for empty slots
+        """
+        contributions = self.contributions()
+        order = np.argsort(-contributions, axis=2, kind="stable")[:, :, :n]
+        return [[[explanation_attributes[a] for a in order[g, i]] if self.ids[g, i] >= 0 else []
+                 for i in range(self.ids.shape[1])] for g in range(len(self))]
+
+
+# -------------------------------------------------------------
+# BATCH COMPATIBILITY FUNCTION
+# -------------------------------------------------------------
+
+@span("batch")
+def compatible_tenants_batch(seed_groups, top_n=5, filters=None, backend=None, weights=None):
+    """
+    Recommends the top N tenants for many seed groups in one pass.
+
+    All group centroids are scored together by the search backend (for the
+    exact backend: one matrix multiply per block of groups, followed by a
+    vectorized top-k).
+
+    Parameters:
+    - seed_groups: List of lists of tenant IDs
+    - top_n: Number of recommendations per group
+    - filters: Hard constraints shared by all groups; see build_filter_mask
+    - backend: Search backend to use (default: the one set with use_search_backend)
+    - weights: Optional trait weights (profile name, dict or array); see resolve_weights
+
+    Returns:
+    - BatchMatchResult
+
+    Raises:
+    - ValueError if a group is empty or contains unknown IDs, or for invalid weights
+    """
+    ensure_loaded()
+    n_tenants = len(feature_matrix)
+    seed_rows = []
+    for group in seed_groups:
+        rows = store.rows_for_ids(group)
+        if len(rows) == 0 or (rows < 0).any():
+            raise ValueError(f"Invalid seed group: {group}")
+        seed_rows.append(rows)
+
+    top_n = min(top_n, n_tenants)
+    if len(seed_rows) == 0:
+        return BatchMatchResult(seed_groups, np.zeros((0, top_n), dtype=np.int64),
+                                np.zeros((0, top_n), dtype=np.float32))
+
+    vectors = None
+    if backend is None:
+        backend, weight_key = resolve_weights(weights)
+        vectors = backend.vectors_for if weight_key else None
+    mask = build_filter_mask(filters)
+    with span(f"search.{backend.name}"):
+        top_rows, top_scores = backend.search_groups(seed_rows, top_n, mask=mask)
+    ids = np.where(top_rows >= 0, np.asarray(store.ids)[np.maximum(top_rows, 0)], -1)  # Rows -> tenant IDs
+    return BatchMatchResult(seed_groups, ids, top_scores, vectors)
 
 
 # -------------------------------------------------------------
 # MAIN COMPATIBILITY FUNCTION
 # -------------------------------------------------------------
 
-def compatible_tenants(tenant_ids, top_n=5):
+@span("match")
+def compatible_tenants(tenant_ids, top_n=5, filters=None, weights=None):
     """
     Recommends the top N most compatible tenants based on cosine similarity.
 
     Parameters:
-    - tenant_ids: List of tenant IDs (1-based, e.g., [12, 55])
+    - tenant_ids: List of tenant IDs (e.g., [12, 55])
     - top_n: Number of recommendations to return
+    - filters: Optional hard constraints applied before ranking, as a dict
+      (e.g., {"smoker": "No", "pet_allergy": "No"}) or a Bitmap; see build_filter_mask
+    - weights: Optional trait weights: a profile name ("quiet_home", "social"),
+      a dict attribute -> weight or an array; see resolve_weights
 
     Returns:
     - Tuple:
         0. Transposed DataFrame with characteristics of seed + recommended tenants
         1. Series with similarity scores (index = recommended tenant IDs)
+      With filters, all returned tenants qualify and fewer than top_n are
+      returned only when fewer tenants qualify.
+
+    Raises:
+    - ValueError for invalid weights
     """
-    # Validate that tenant IDs are within range
-    if any(t < 1 or t > len(df_normalized) for t in tenant_ids):
+    ensure_loaded()
+    # Validate that all tenant IDs exist
+    seed_rows = store.rows_for_ids(tenant_ids)
+    if len(seed_rows) == 0 or (seed_rows < 0).any():
         return "One or more tenant IDs are out of range."
 
-    # Convert 1-based IDs to 0-based indices
-    seed_indices = [t - 1 for t in tenant_ids]
+    backend, weight_key = resolve_weights(weights)
 
-    # Extract vectors for seed tenants and full dataset
-    X_seed = df_normalized.iloc[seed_indices].to_numpy()
-    X_all = df_normalized.to_numpy()
+    # Served from the result cache when the same query ran before. Repeated
+    # seeds weigh more in the centroid, so they are part of the key; so is the
+    # backend, so a query still running when the backend is switched cannot
+    # store its result under the new one
+    filter_key = filters_key(filters)
+    key = None
+    if filter_key is not None:
+        key = (tuple(sorted(int(i) for i in tenant_ids)), int(top_n), filter_key, weight_key,
+               search_backend.name, store.version)
+        with span("match.cache"):
+            cached = result_cache.get(key)
+        if cached is not None:
+            return build_result(tenant_ids, cached[0].tolist(), cached[1])
 
-    # Compute cosine similarity between seed and all profiles
-    similarity_scores = cosine_similarity(X_seed, X_all)
-    average_similarity = np.mean(similarity_scores, axis=0)
+    mask = build_filter_mask(filters)
 
-    # Exclude seed tenants from recommendations
-    for idx in seed_indices:
-        average_similarity[idx] = -1
+    # Answer from the kNN graph when its neighbour lists prove the result exact
+    top_ids = None
+    if knn_graph is not None and not weight_key and isinstance(search_backend, ExactSearch):
+        with span("match.knn_graph"):
+            hit = knn_graph.search(feature_matrix, seed_rows, top_n, mask)
+        if hit is not None:
+            top_rows, top_scores = hit
+            top_ids = np.asarray(store.ids)[top_rows]
 
-    # Select top N most similar tenant indices
-    top_indices = np.argsort(average_similarity)[-top_n:][::-1]
-    top_tenant_ids = [i + 1 for i in top_indices]  # Convert back to 1-based
+    if top_ids is None:
+        batch = compatible_tenants_batch([tenant_ids], top_n, mask, backend=backend)
+        top_ids, top_scores = batch.ids[0, :batch.counts[0]], batch.scores[0, :batch.counts[0]]
 
-    # Extract raw profile data
-    seed_profiles = df_raw[df_raw['id_tenant'].isin(tenant_ids)]
-    top_profiles = df_raw[df_raw['id_tenant'].isin(top_tenant_ids)]
+    if key is not None:
+        result_cache.put(key, (np.array(top_ids, dtype=np.int64), np.array(top_scores, dtype=np.float32)))
+    return build_result(tenant_ids, top_ids.tolist(), top_scores)
 
-    # Combine into a single transposed DataFrame
-    result_df = pd.concat([seed_profiles.set_index("id_tenant").T,
-                           top_profiles.set_index("id_tenant").T], axis=1)
 
-    # Prepare similarity scores
-    similarities = pd.Series(average_similarity[top_indices],
-                             index=top_tenant_ids, name="Similarity")
+@span("explain_matches")
+def explain_matches(tenant_ids, match_ids, weights=None):
+    """
+    Splits each match's similarity score into per-attribute contributions.
 
-    return result_df, similarities
+    The score is the dot product of the match's normalized row with the mean
+    of the seeds' rows; each attribute contributes the sum of that product
+    over its encoded columns, so the contributions of a match add up to its
+    score. Shared one-hot values and languages contribute, differing ones do not.
+
+    Parameters:
+    - tenant_ids: Seed tenant IDs
+    - match_ids: Recommended tenant IDs (e.g., the index of the similarity Series)
+    - weights: The trait weights the matches were ranked with (see resolve_weights)
+
+    Returns:
+    - DataFrame indexed by match ID, one column per raw attribute
+    """
+    ensure_loaded()
+    seed_rows = store.rows_for_ids(tenant_ids)
+    match_rows = store.rows_for_ids(match_ids)
+    if (seed_rows < 0).any() or (match_rows < 0).any():
+        raise ValueError("One or more tenant IDs are out of range.")
+
+    backend, weight_key = resolve_weights(weights)
+    vectors = backend.vectors_for if weight_key else feature_matrix
+    contributions = contribution_breakdown(vectors, [seed_rows], match_rows[None, :], explanation_aggregation)
+    return pd.DataFrame(contributions[0], index=pd.Index(list(match_ids), name="id_tenant"),
+                        columns=explanation_attributes)
+
+
+def reciprocal_matches(tenant_id, top_n=10):
+    """
+    Tenants that rank 'tenant_id' highly and are ranked highly by it,
+    read from the kNN graph.
+
+    Returns:
+    - DataFrame indexed by tenant ID with similarity, rank, reverse_rank and
+      reciprocal_score columns, or a message if the graph is not built
+    """
+    ensure_loaded()
+    if knn_graph is None:
+        return "kNN graph not built. Run `python knn_graph.py` first."
+    row = store.rows_for_ids([tenant_id])[0]
+    if row < 0:
+        return "Tenant ID is out of range."
+
+    matches = knn_graph.reciprocal_matches(row, top_n)
+    tenant_ids = np.asarray(store.ids)[matches.pop("rows")]
+    return pd.DataFrame(matches, index=pd.Index(tenant_ids, name="id_tenant"))
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from feature_store import RAW_PATH, get_encoder
+from profiling import span
+
+# -------------------------------------------------------------
+# COMPACT RAW-PROFILE STORE
+# -------------------------------------------------------------
+#
+# Raw tenant attributes are only needed to display or export a handful of
+# profiles per request, so they are kept compact:
+#
+# - every string attribute as a pandas categorical (int8 codes plus one
+#   vocabulary per column, shared by all rows)
+# - numeric attributes as plain integers
+# - an id -> row table, so fetching profiles is a direct positional gather
+#
+# Strings are decoded only for the rows being shown. Rows are in CSV order,
+# i.e. the same order as the feature store.
+
+# IDs up to this multiple of the row count get a dense id -> row array;
+# sparser IDs fall back to a sorted search
+DENSE_ID_FACTOR = 4
+
+
+class ProfileStore:
+    """
+    Compact raw profiles with id -> row lookup.
+
+    Attributes:
+    - frame: DataFrame with the raw CSV columns (string attributes categorical)
+    - ids: int64 array with the tenant ID of each row
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.ids = frame["id_tenant"].to_numpy(dtype=np.int64)
+
+        # Per column: codes + object vocabulary (missing -> NaN as the last
+        # entry, so code -1 decodes to NaN), or the plain values
+        self._columns = {}
+        for col in frame.columns:
+            series = frame[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                vocabulary = np.append(series.cat.categories.to_numpy(dtype=object), np.nan)
+                self._columns[col] = (series.cat.codes.to_numpy(), vocabulary)
+            else:
+                self._columns[col] = (series.to_numpy(), None)
+
+        self._positions = None
+        n = len(self.ids)
+        if n and self.ids.min() >= 0 and self.ids.max() < DENSE_ID_FACTOR * n + 1024:
+            self._positions = np.full(int(self.ids.max()) + 1, -1, dtype=np.int64)
+            self._positions[self.ids] = np.arange(n)
+        else:
+            self._order = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = self.ids[self._order]
+
+    @classmethod
+    def from_csv(cls, raw_path=RAW_PATH):
+        """
+        Reads the raw CSV straight into categoricals (the numeric columns
+        from metadata.xlsx stay numeric).
+        """
+        encoder = get_encoder()
+        keep_numeric = {v["name"] for v in encoder.numeric} | {encoder.id_column}
+        columns = pd.read_csv(raw_path, nrows=0).columns
+        dtypes = {col: "category" for col in columns if col not in keep_numeric}
+        return cls(pd.read_csv(raw_path, dtype=dtypes))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def rows_for_ids(self, tenant_ids):
+        """
+        Returns:
+        - int64 array of rows, -1 for unknown IDs
+        """
+        tenant_ids = np.asarray(tenant_ids, dtype=np.int64)
+        if self._positions is not None:
+            known = (tenant_ids >= 0) & (tenant_ids < len(self._positions))
+            rows = np.full(len(tenant_ids), -1, dtype=np.int64)
+            rows[known] = self._positions[tenant_ids[known]]
+            return rows
+
+        if len(self._sorted_ids) == 0:
+            return np.full(len(tenant_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, tenant_ids), len(self._sorted_ids) - 1)
+        known = self._sorted_ids[positions] == tenant_ids
+        return np.where(known, self._order[positions], -1).astype(np.int64)
+
+    @span("profiles.table")
+    def table(self, *id_groups):
+        """
+        Transposed profiles (one row per attribute, one column per tenant)
+        of one or more groups of IDs placed side by side, as shown in the
+        app. Within a group, tenants are in dataset order, unknown IDs and
+        duplicates are dropped. Built as a single object array, so the cost
+        depends on the number of tenants shown, not on the dataset size.
+        """
+        rows = []
+        for tenant_ids in id_groups:
+            group_rows = self.rows_for_ids(tenant_ids)
+            rows.append(np.unique(group_rows[group_rows >= 0]))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+
+        attributes = [col for col in self._columns if col != "id_tenant"]
+        table = np.empty((len(attributes), len(rows)), dtype=object)
+        for j, col in enumerate(attributes):
+            values, vocabulary = self._columns[col]
+            table[j] = values[rows] if vocabulary is None else vocabulary[values[rows]]
+        return pd.DataFrame(table, index=attributes, columns=pd.Index(self.ids[rows], name="id_tenant"))
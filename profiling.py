@@ -0,0 +1,306 @@
+import cProfile
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------------------------------------------------
+# STAGE-LEVEL TIMING SPANS
+# -------------------------------------------------------------
+#
+# Stages of the request path are wrapped in named spans:
+#
+#     with span("match.search"):
+#         ...
+#
+#     @span("ui.chart")
+#     def generate_compatibility_chart(...):
+#
+# Every span is aggregated into a per-name latency histogram. The outermost
+# span of a thread is a "request": when it ends, its duration and the
+# durations of the spans nested in it are handed to the configured sinks
+# (log lines, JSON lines), and the histograms can be scraped in Prometheus
+# text format (serve_metrics) or dumped as JSON (dump_json).
+#
+# Optionally, a sample of requests runs under cProfile and the profile is
+# kept when the request is slower than a threshold (see configure).
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("livio.profiling")
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets (seconds, Prometheus-style
+    upper bounds) plus count, sum and max.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_s": self.sum,
+            "mean_ms": 1000 * self.sum / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.quantile(0.5),
+            "p99_ms": 1000 * self.quantile(0.99),
+            "max_ms": 1000 * self.max,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class Registry:
+    """Thread-safe map of span name -> Histogram."""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def snapshot(self):
+        """
+        Returns:
+        - Dict span name -> histogram summary (see Histogram.to_dict)
+        """
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self.histograms.items())}
+
+    def prometheus_text(self, metric="livio_span_seconds"):
+        """Histograms in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [f"# HELP {metric} Duration of instrumented stages.", f"# TYPE {metric} histogram"]
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {h.sum}')
+                lines.append(f'{metric}_count{{span="{name}"}} {h.count}')
+            return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# -------------------------------------------------------------
+# SINKS
+# -------------------------------------------------------------
+#
+# A sink is any object with an emit(record) method. 'record' describes one
+# finished request: {"name", "duration_ms", "spans": [[name, ms], ...],
+# "profile": path or None}.
+
+class LogSink:
+    """
+    Logs one line per request slower than 'min_ms', e.g.
+    "match 23.1ms | match.filter 0.3ms, match.search 10.2ms, ...".
+    """
+
+    def __init__(self, log=None, min_ms=0.0, level=logging.INFO):
+        self.log = log or logger
+        self.min_ms = min_ms
+        self.level = level
+
+    def emit(self, record):
+        if record["duration_ms"] < self.min_ms:
+            return
+        stages = ", ".join(f"{name} {ms:.1f}ms" for name, ms in record["spans"])
+        self.log.log(self.level, f"{record['name']} {record['duration_ms']:.1f}ms | {stages}")
+
+
+class JsonLinesSink:
+    """Appends every request record as one JSON line to 'path'."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+_config = {
+    "sinks": [],
+    "profile_threshold_ms": None,
+    "profile_sample_rate": 0.0,
+    "profile_dir": "profiles",
+}
+
+
+def configure(sinks=None, profile_threshold_ms=None, profile_sample_rate=0.1, profile_dir="profiles"):
+    """
+    Sets where request records go and the cProfile sampling mode.
+
+    Parameters:
+    - sinks: List of sinks (e.g., [LogSink(min_ms=100)]); None keeps the current ones
+    - profile_threshold_ms: Keep cProfile profiles of sampled requests slower
+      than this (None disables profiling)
+    - profile_sample_rate: Fraction of requests run under cProfile
+    - profile_dir: Directory the .prof files are written to
+    """
+    if sinks is not None:
+        _config["sinks"] = list(sinks)
+    _config["profile_threshold_ms"] = profile_threshold_ms
+    _config["profile_sample_rate"] = profile_sample_rate if profile_threshold_ms is not None else 0.0
+    _config["profile_dir"] = profile_dir
+
+
+def dump_json(path):
+    """Writes the current histograms to 'path' as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f, indent=2)
+
+
+def serve_metrics(port=9100, host="127.0.0.1"):
+    """
+    Serves the histograms over HTTP from a daemon thread:
+    /metrics (Prometheus text format) and /metrics.json.
+
+    Returns:
+    - The running ThreadingHTTPServer (call shutdown() to stop it)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------------------------------------------------------------
+# SPANS
+# -------------------------------------------------------------
+
+_local = threading.local()
+_profile_ids = itertools.count()
+
+
+class span:
+    """
+    Times a stage, as a context manager or a decorator.
+
+    State lives on a per-thread stack, not on the instance, so one decorator
+    instance is safe across threads and recursive calls.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, func):
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+
+        frame = {"name": self.name, "spans": [], "profiler": None}
+        if not stack and _config["profile_sample_rate"] and random.random() < _config["profile_sample_rate"]:
+            frame["profiler"] = cProfile.Profile()
+            try:
+                frame["profiler"].enable()
+            except ValueError:  # Another profiler is already active
+                frame["profiler"] = None
+        stack.append(frame)
+        frame["start"] = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - _local.stack[-1]["start"]
+        frame = _local.stack.pop()
+        registry.observe(self.name, seconds)
+
+        if _local.stack:
+            parent = _local.stack[-1]
+            parent["spans"].append([self.name, 1000 * seconds])
+            parent["spans"].extend(frame["spans"])
+            return False
+
+        _finish_request(frame, seconds)
+        return False
+
+
+def _finish_request(frame, seconds):
+    duration_ms = 1000 * seconds
+    profile_path = None
+    if frame["profiler"] is not None:
+        frame["profiler"].disable()
+        if duration_ms >= _config["profile_threshold_ms"]:
+            os.makedirs(_config["profile_dir"], exist_ok=True)
+            profile_path = os.path.join(_config["profile_dir"],
+                                        f"{frame['name']}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                                        f"{next(_profile_ids)}-{int(duration_ms)}ms.prof")
+            frame["profiler"].dump_stats(profile_path)
+
+    if not _config["sinks"]:
+        return
+    record = {"name": frame["name"], "duration_ms": duration_ms, "spans": frame["spans"], "profile": profile_path}
+    for sink in _config["sinks"]:
+        try:
+            sink.emit(record)
+        except Exception as e:  # A broken sink must not fail the request
+            logger.warning(f"Profiling sink {type(sink).__name__} failed: {e}")
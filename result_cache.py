@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# -------------------------------------------------------------
+# MATCH RESULT CACHE
+# -------------------------------------------------------------
+#
+# Match results are cached per (sorted seed IDs with repeats, top_n, filters,
+# trait weights, search backend name, dataset version) as compact id / score
+# arrays; the DataFrames shown in the app are rebuilt from them, which is
+# cheap. The cache lives at module level, so it is shared by every Streamlit
+# rerun and session of the process.
+#
+# Entries are evicted least-recently-used beyond 'max_entries' and expire
+# after 'ttl' seconds. Binding a new dataset version (after a rebuild or an
+# ingest) drops every entry.
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 600
+
+
+def filters_key(filters):
+    """
+    Canonical, hashable form of a filters dict (any-of lists are sorted, so
+    the same filter set always gives the same key).
+
+    Returns:
+    - String key, or None for filters that are not cacheable (masks, Bitmaps)
+    """
+    if filters is None or (isinstance(filters, dict) and not filters):
+        return ""
+    if not isinstance(filters, dict):
+        return None
+
+    def canonical(value):
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple, set, np.ndarray)):
+            return sorted((canonical(v) for v in value), key=str)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    return json.dumps(canonical(filters), sort_keys=True, default=str)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a time-to-live.
+
+    Attributes:
+    - max_entries: Entries kept before the least recently used is evicted
+    - ttl: Seconds an entry stays valid (None = no expiry)
+    - version: Dataset version the entries belong to
+    - hits / misses / evictions / expirations / invalidations: Counters
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bind(self, version):
+        """Drops every entry if the dataset version changed."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key):
+        """
+        Returns:
+        - The cached value, or None on a miss (unknown or expired key)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+        - Dict with the size, capacity, counters and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------------------------------------
+# TENANT SCHEMA COMPILED FROM metadata.xlsx
+# -------------------------------------------------------------
+#
+# Every variable of 'metadata.xlsx' (sheet "Tabla1", columns Variable /
+# Values) is classified from its "Values" description:
+#
+#   "Unique ID"                     -> id
+#   "Yes / No"                      -> binary
+#   "Numeric (€)", "1–5 scale"      -> numeric (the scale gives bounds)
+#   "Multiselect (English, ...)"    -> multi-valued, comma separated
+#   "A / B / C"                     -> categorical
+#
+# A categorical value named "None" means "no answer": it is accepted but
+# encodes as an all-zero one-hot, like a missing value.
+
+METADATA_PATH = "metadata.xlsx"
+METADATA_SHEET = "Tabla1"
+SCHEMA_CACHE_FILE = "schema.json"
+
+NO_ANSWER = "None"
+MULTI_SEPARATOR = ","
+
+
+def _parse_variable(name, description):
+    description = str(description).strip()
+    if description == "Unique ID":
+        return {"name": name, "kind": "id"}
+    if description == "Yes / No":
+        return {"name": name, "kind": "binary", "values": ["No", "Yes"]}
+    if description.startswith("Numeric"):
+        return {"name": name, "kind": "numeric", "min": None, "max": None}
+
+    scale = re.match(r"(\d+)\s*[–-]\s*(\d+)\s*scale", description)
+    if scale:
+        return {"name": name, "kind": "numeric", "min": float(scale.group(1)), "max": float(scale.group(2))}
+
+    if description.startswith("Multiselect"):
+        inner = description[description.find("(") + 1:description.rfind(")")]
+        tokens = [t.strip() for t in inner.split(",") if t.strip() and t.strip() != "etc."]
+        return {"name": name, "kind": "multi", "values": tokens}
+
+    return {"name": name, "kind": "categorical",
+            "values": [v.strip() for v in description.split("/") if v.strip()]}
+
+
+def compile_metadata(metadata_path=METADATA_PATH):
+    """
+    Reads 'metadata.xlsx' into a plain-dict schema (one entry per variable).
+    """
+    df_meta = pd.read_excel(metadata_path, sheet_name=METADATA_SHEET)
+    return [_parse_variable(row["Variable"], row["Values"]) for _, row in df_meta.iterrows()]
+
+
+def load_variables(metadata_path=METADATA_PATH, cache_dir=None):
+    """
+    Returns the compiled variable list, reading the spreadsheet only when
+    it changed since the last compile (the result is cached as JSON in
+    'cache_dir', so workers do not need to parse Excel on startup).
+    """
+    with open(metadata_path, "rb") as f:
+        metadata_hash = hashlib.sha256(f.read()).hexdigest()
+
+    cache_path = os.path.join(cache_dir, SCHEMA_CACHE_FILE) if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("metadata_hash") == metadata_hash:
+                return cached["variables"]
+        except (OSError, ValueError):
+            pass
+
+    variables = compile_metadata(metadata_path)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"metadata_hash": metadata_hash, "variables": variables}, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    return variables
+
+
+# -------------------------------------------------------------
+# VECTORIZED ENCODER
+# -------------------------------------------------------------
+
+def _vocabulary_codes(values, vocabulary):
+    """
+    Position of every value in 'vocabulary' (-1 for missing or unknown).
+    The column is factorized once, so the lookup runs over its few
+    distinct strings instead of every row.
+    """
+    codes, uniques = pd.factorize(values)
+    positions = {value: i for i, value in enumerate(vocabulary)}
+    lookup = np.array([positions.get(u, -1) for u in uniques] + [-1], dtype=np.int64)
+    return lookup[codes]  # code -1 (missing) hits the trailing -1
+
+
+class TenantEncoder:
+    """
+    Encoder compiled once from the schema. Each column is factorized once
+    (so per-value work runs over the few distinct strings, not every row)
+    and mapped to features through NumPy lookup arrays:
+
+    - categorical: vocabulary position -> one-hot column via fancy indexing
+    - multi-valued: distinct strings tokenized once -> token bitmask rows
+    - Yes/No: code -> 0/1 lookup
+
+    Feature layout: numeric, Yes/No, multi-valued tokens ("lang_<token>"
+    for languages_spoken), then one column per categorical value in sorted
+    order (the same layout pd.get_dummies produced).
+
+    Parameters:
+    - variables: Output of load_variables / compile_metadata
+    """
+
+    def __init__(self, variables):
+        self.variables = variables
+        by_kind = lambda kind: [v for v in variables if v["kind"] == kind]
+
+        self.numeric = by_kind("numeric")
+        self.binary = by_kind("binary")
+        self.multi = by_kind("multi")
+        self.categorical = by_kind("categorical")
+        self.id_column = next((v["name"] for v in by_kind("id")), None)
+
+        # Sorted vocabularies without the "no answer" value
+        self.categories = {v["name"]: sorted(x for x in v["values"] if x != NO_ANSWER)
+                           for v in self.categorical}
+
+        self.columns = [v["name"] for v in self.numeric] + [v["name"] for v in self.binary]
+        for v in self.multi:
+            self.columns += [f"{self.multi_prefix(v['name'])}{token}" for token in v["values"]]
+        for v in self.categorical:
+            self.columns += [f"{v['name']}_{value}" for value in self.categories[v["name"]]]
+
+        # Raw variable each encoded column comes from
+        self.sources = [v["name"] for v in self.numeric + self.binary]
+        for v in self.multi:
+            self.sources += [v["name"]] * len(v["values"])
+        for v in self.categorical:
+            self.sources += [v["name"]] * len(self.categories[v["name"]])
+
+        self.fingerprint = hashlib.sha256(json.dumps(variables, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def multi_prefix(name):
+        return "lang_" if name == "languages_spoken" else f"{name}_"
+
+    @property
+    def raw_columns(self):
+        return [v["name"] for v in self.variables]
+
+    def encode(self, df_rows):
+        """
+        Encodes raw rows into unscaled float64 features laid out as self.columns
+        (an n_rows x n_features, column-major array).
+        Invalid Yes/No or numeric values encode as NaN; unknown categories and
+        tokens encode as zeros (use validate() to reject them).
+        """
+        # Built feature-major so every column is written contiguously
+        features = np.zeros((len(self.columns), len(df_rows)), dtype=np.float64)
+        j = 0
+
+        for v in self.numeric:
+            features[j] = pd.to_numeric(df_rows[v["name"]], errors="coerce").to_numpy(dtype=np.float64)
+            j += 1
+
+        binary_lut = np.array([0.0, 1.0, np.nan])  # position -1 (invalid) -> NaN
+        for v in self.binary:
+            features[j] = binary_lut[_vocabulary_codes(df_rows[v["name"]], ["No", "Yes"])]
+            j += 1
+
+        for v in self.multi:
+            tokens = v["values"]
+            codes, uniques = pd.factorize(df_rows[v["name"]])
+            table = np.zeros((len(tokens), len(uniques) + 1), dtype=np.float64)  # last: missing
+            for u, text in enumerate(uniques):
+                present = {t.strip() for t in str(text).split(MULTI_SEPARATOR)}
+                table[:, u] = [token in present for token in tokens]
+            features[j:j + len(tokens)] = table[:, codes]
+            j += len(tokens)
+
+        for v in self.categorical:
+            vocab = self.categories[v["name"]]
+            codes = _vocabulary_codes(df_rows[v["name"]], vocab)
+            for position in range(len(vocab)):
+                features[j + position] = codes == position
+            j += len(vocab)
+
+        return features.T
+
+    def validate(self, df_rows):
+        """
+        Checks raw rows against the schema.
+
+        Returns:
+        - List of human-readable problems (empty if all rows are valid)
+        """
+        problems = []
+        missing = [name for name in self.raw_columns if name not in df_rows.columns]
+        if missing:
+            return [f"missing columns: {missing}"]
+
+        for v in self.binary + self.categorical:
+            allowed = set(v["values"])
+            values = df_rows[v["name"]].dropna()
+            invalid = sorted(set(pd.unique(values)) - allowed, key=str)
+            if invalid:
+                problems.append(f"invalid values for '{v['name']}': {invalid}")
+            if v["kind"] == "binary" and df_rows[v["name"]].isna().any():
+                problems.append(f"missing values for '{v['name']}'")
+
+        for v in self.multi:
+            allowed = set(v["values"])
+            texts = pd.unique(df_rows[v["name"]].dropna())
+            found = {t.strip() for text in texts for t in str(text).split(MULTI_SEPARATOR)}
+            invalid = sorted(found - allowed)
+            if invalid:
+                problems.append(f"invalid values for '{v['name']}': {invalid}")
+
+        for v in self.numeric:
+            values = pd.to_numeric(df_rows[v["name"]], errors="coerce")
+            if values.isna().any():
+                problems.append(f"missing or non-numeric values for '{v['name']}'")
+            if v["min"] is not None and (values < v["min"]).any():
+                problems.append(f"'{v['name']}' below {v['min']:g}")
+            if v["max"] is not None and (values > v["max"]).any():
+                problems.append(f"'{v['name']}' above {v['max']:g}")
+
+        return problems
+
+
+def load_encoder(metadata_path=METADATA_PATH, cache_dir=None):
+    """Compiles (or loads the cached compile of) the schema into a TenantEncoder."""
+    return TenantEncoder(load_variables(metadata_path, cache_dir))
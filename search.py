@@ -0,0 +1,300 @@
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# -------------------------------------------------------------
+# TOP-K SELECTION
+# -------------------------------------------------------------
+
+def top_k_rows(scores, k):
+    """
+    Row-wise top-k of a 2-D score array (one row per query).
+
+    Returns:
+    - Tuple (indices, values), both of shape (n_rows, min(k, n_cols)), best
+      first. Equal scores are ranked by lower index, so the result does not
+      depend on how the columns were partitioned (see ShardedExactSearch).
+      Slots without a finite score hold index -1 and value -inf.
+    """
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int64), np.empty((n_rows, 0), dtype=scores.dtype)
+
+    if k < n_cols:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(scores, candidates, axis=1)
+
+        # argpartition picks arbitrarily among scores tied with the k-th
+        # best; keep the lowest indices instead
+        kth = values.min(axis=1)
+        tied = np.isfinite(kth) & (np.count_nonzero(scores >= kth[:, None], axis=1) > k)
+        for i in np.flatnonzero(tied):
+            above = np.flatnonzero(scores[i] > kth[i])
+            candidates[i] = np.concatenate((above, np.flatnonzero(scores[i] == kth[i])[:k - len(above)]))
+    else:
+        candidates = np.tile(np.arange(n_cols), (n_rows, 1))
+    values = np.take_along_axis(scores, candidates, axis=1)
+
+    order = np.lexsort((candidates, -values), axis=1)
+    indices = np.take_along_axis(candidates, order, axis=1).astype(np.int64)
+    values = np.take_along_axis(values, order, axis=1)
+    indices[~np.isfinite(values)] = -1
+    return indices, values
+
+
+# -------------------------------------------------------------
+# SEARCH BACKENDS
+# -------------------------------------------------------------
+
+def seed_centroids(vectors, group_sizes):
+    """
+    Mean of the normalized seed vectors of each group. The average cosine
+    similarity of a tenant to the seeds equals its dot product with this mean.
+
+    Parameters:
+    - vectors: Seed vectors of all groups, stacked group after group
+    - group_sizes: Number of seeds in each group
+    """
+    sizes = np.asarray(group_sizes)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    sums = np.add.reduceat(np.asarray(vectors, dtype=np.float32), starts, axis=0)
+    return sums / sizes[:, None].astype(np.float32)
+
+
+class SearchBackend:
+    """
+    Scores seed groups against all tenants and returns the best rows.
+
+    Subclasses implement:
+
+        vectors_for(rows) -> float32 array of the normalized vectors of 'rows'
+        search(queries, k, exclude=None, mask=None) -> (rows, scores)
+
+    - queries: float32 array (n_queries x n_features)
+    - exclude: optional list (one entry per query) of rows to leave out
+    - mask: optional boolean array, True for rows allowed in the results
+    - rows / scores: arrays (n_queries x k), best first, -1 / -inf when empty
+
+    or override search_groups directly when they do not score centroids.
+    """
+
+    name = None
+
+    def search_groups(self, seed_rows, k, mask=None):
+        """
+        Top-k rows by average cosine similarity to each group of seed rows,
+        leaving the seeds themselves out.
+
+        Parameters:
+        - seed_rows: List of int arrays (0-based rows), one per group
+        - k: Results per group
+        - mask: Optional boolean array of qualifying rows
+        """
+        vectors = self.vectors_for(np.concatenate(seed_rows))
+        queries = seed_centroids(vectors, [len(rows) for rows in seed_rows])
+        return self.search(queries, k, exclude=seed_rows, mask=mask)
+
+
+class ExactSearch(SearchBackend):
+    """
+    Brute-force backend: one matrix multiply per block of queries.
+
+    Parameters:
+    - matrix: L2-normalized float32 matrix (n x d)
+    - block_size: Queries scored per matrix multiply (default keeps each
+      score block around 64 MB)
+    """
+
+    name = "exact"
+
+    def __init__(self, matrix, block_size=None):
+        self.matrix = matrix
+        self.block_size = block_size or max(1, (1 << 24) // max(len(matrix), 1))
+
+    def vectors_for(self, rows):
+        return self.matrix[rows]
+
+    def score_block(self, queries):
+        """Scores of a block of queries against every row (n_queries x n)."""
+        return queries @ self.matrix.T
+
+    def shard(self, start, stop):
+        """Backend over rows start:stop only (rows numbered from 0)."""
+        return ExactSearch(self.matrix[start:stop], self.block_size)
+
+    def search(self, queries, k, exclude=None, mask=None):
+        n_queries = len(queries)
+        k = min(k, len(self.matrix))
+        rows = np.full((n_queries, k), -1, dtype=np.int64)
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        excluded = None if mask is None else np.flatnonzero(~mask)
+
+        for start in range(0, n_queries, self.block_size):
+            stop = min(start + self.block_size, n_queries)
+            block_scores = self.score_block(queries[start:stop])
+
+            if excluded is not None:
+                block_scores[:, excluded] = -np.inf
+            if exclude is not None:
+                for local, excluded_rows in enumerate(exclude[start:stop]):
+                    block_scores[local, excluded_rows] = -np.inf
+
+            rows[start:stop], scores[start:stop] = top_k_rows(block_scores, k)
+
+        return rows, scores
+
+
+class ReweightedSearch(ExactSearch):
+    """
+    Exact search under per-column weights without a reweighted copy of the
+    matrix. For normalized rows x and column weights w, the weighted cosine
+    of x with a query q (already in the weighted, normalized space) is
+
+        (x * w) . q / |x * w|  =  x . (w * q) / sqrt(x^2 . w^2)
+
+    The denominators take one pass over the matrix at construction (n
+    floats kept); each query then costs one matrix multiply, as unweighted.
+
+    Parameters:
+    - matrix: L2-normalized float32 matrix (n x d)
+    - weights: float32 array (d) of non-negative column weights
+    - block_size: See ExactSearch
+    """
+
+    name = "reweighted"
+
+    def __init__(self, matrix, weights, block_size=None, chunk=1 << 16):
+        super().__init__(matrix, block_size)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        squared = self.weights * self.weights
+        norms = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), chunk):
+            rows = np.asarray(matrix[start:start + chunk], dtype=np.float32)
+            norms[start:start + chunk] = np.sqrt((rows * rows) @ squared)
+        # Rows without any weighted feature score 0
+        self.inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    @property
+    def nbytes(self):
+        return self.inv_norms.nbytes
+
+    def vectors_for(self, rows):
+        vectors = np.asarray(self.matrix[rows], dtype=np.float32) * self.weights
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def score_block(self, queries):
+        return ((queries * self.weights) @ self.matrix.T) * self.inv_norms
+
+    def shard(self, start, stop):
+        shard = copy.copy(self)
+        shard.matrix = self.matrix[start:stop]
+        shard.inv_norms = self.inv_norms[start:stop]
+        return shard
+
+
+class ShardedExactSearch(ExactSearch):
+    """
+    Exact backend that splits the matrix into contiguous row shards and
+    scores them on a thread pool. NumPy releases the GIL in the matrix
+    multiply and the partition, so shards run on separate cores while
+    sharing the same (memory-mapped) matrix, without copies or pickling.
+
+    Every shard returns its own top-k (rows in global numbering); the
+    partial lists are merged with the same top_k_rows. Scores are computed
+    per element exactly as in ExactSearch and ties are ranked by lower row
+    on both levels, so results are identical to the single-threaded path.
+
+    Parameters:
+    - matrix: L2-normalized float32 matrix (n x d)
+    - n_shards: Number of row shards (default: one per worker)
+    - workers: Thread pool size (default: number of CPUs)
+    - min_rows: Matrices with fewer rows are searched single-threaded,
+      where the pool overhead outweighs the gain
+    - block_size: See ExactSearch
+    - base: Exact backend whose scores are sharded (default: ExactSearch
+      over 'matrix'), e.g. a ReweightedSearch; see also over()
+
+    The BLAS library may start threads of its own; with many shards, limit
+    it to one thread per process (e.g. OPENBLAS_NUM_THREADS=1) to avoid
+    oversubscribing the cores.
+    """
+
+    name = "sharded"
+
+    def __init__(self, matrix, n_shards=None, workers=None, min_rows=200_000, block_size=None, base=None):
+        super().__init__(matrix, block_size)
+        self.base = base if base is not None else ExactSearch(matrix, self.block_size)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.n_shards = max(1, min(n_shards or self.workers, len(matrix) or 1))
+        self.min_rows = min_rows
+        self.bounds = np.linspace(0, len(matrix), self.n_shards + 1).astype(np.int64)
+        self._owner = self
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def over(self, base):
+        """
+        Sharded search of another exact backend over the same rows (e.g. a
+        weighted one), with the same shards and sharing this backend's
+        thread pool.
+        """
+        sharded = ShardedExactSearch(base.matrix, self.n_shards, self.workers, self.min_rows,
+                                     base.block_size, base=base)
+        sharded._owner = self
+        return sharded
+
+    @property
+    def parallel(self):
+        return self.n_shards > 1 and len(self.matrix) >= self.min_rows
+
+    def vectors_for(self, rows):
+        return self.base.vectors_for(rows)
+
+    def score_block(self, queries):
+        return self.base.score_block(queries)
+
+    def search(self, queries, k, exclude=None, mask=None):
+        if not self.parallel:
+            return self.base.search(queries, k, exclude=exclude, mask=mask)
+
+        # Concurrent first queries (service, bulk workers) must share one pool
+        owner = self._owner
+        with owner._pool_lock:
+            if owner._pool is None:
+                owner._pool = ThreadPoolExecutor(max_workers=owner.workers, thread_name_prefix="shard")
+            pool = owner._pool
+        shards = zip(self.bounds[:-1], self.bounds[1:])
+        partials = list(pool.map(lambda bounds: self._search_shard(queries, k, exclude, mask, *bounds), shards))
+
+        # Shards are in row order and each partial list is sorted by
+        # (score desc, row asc), so position order = row order among ties
+        rows = np.concatenate([rows for rows, _ in partials], axis=1)
+        scores = np.concatenate([scores for _, scores in partials], axis=1)
+        top, top_scores = top_k_rows(scores, min(k, len(self.matrix)))
+        top_rows = np.where(top >= 0, np.take_along_axis(rows, np.maximum(top, 0), axis=1), -1)
+        return top_rows, top_scores.astype(np.float32)
+
+    def _search_shard(self, queries, k, exclude, mask, start, stop):
+        shard = self.base.shard(start, stop)
+        shard_mask = None if mask is None else mask[start:stop]
+        shard_exclude = None
+        if exclude is not None:
+            shard_exclude = []
+            for rows in exclude:
+                rows = np.asarray(rows, dtype=np.int64)
+                shard_exclude.append(rows[(rows >= start) & (rows < stop)] - start)
+
+        rows, scores = shard.search(queries, k, exclude=shard_exclude, mask=shard_mask)
+        return np.where(rows >= 0, rows + start, -1), scores
+
+    def close(self):
+        """Shuts the thread pool down (backends made with over() share it)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import logic
+from profiling import registry, span
+from result_cache import filters_key
+
+# -------------------------------------------------------------
+# ASYNC MATCHING SERVICE
+# -------------------------------------------------------------
+#
+# HTTP/JSON front end for the matcher, independent of the Streamlit app:
+#
+#   python service.py --port 8000
+#
+#   POST /match    {"tenant_ids": [12, 55], "top_n": 5,
+#                   "filters": {"smoker": "No"}, "weights": "quiet_home",
+#                   "profiles": false}
+#   GET  /health   readiness, dataset version and queue depth
+#   GET  /metrics  span latency histograms (Prometheus text format)
+#
+# Concurrent /match requests are micro-batched: the first queued request
+# waits at most 'max_wait_ms' for others, then up to 'max_batch' requests
+# sharing the same filters and weights are scored together by one
+# compatible_tenants_batch call (one matrix multiply). Each request gets
+# the first top_n of the batch's largest top_n, which is the same list a
+# single query returns since ties are ranked by row (see search.top_k_rows).
+#
+# Matching runs on one worker thread, so the event loop keeps accepting
+# and queueing requests meanwhile. When 'max_pending' requests are queued
+# or in flight, new ones are rejected with 503 and a Retry-After header.
+#
+# Only the standard library is used (asyncio streams + a minimal HTTP/1.1
+# parser with keep-alive).
+
+MAX_BODY_BYTES = 1 << 20
+MAX_SEEDS = 50
+MAX_TOP_N = 1000
+
+
+class RequestError(Exception):
+    """Invalid request; answered with the given HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_value(value):
+    # NumPy scalars -> Python, NaN (missing answers) -> null
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _check_filter(col, constraint):
+    # Ranges ({"min": ..., "max": ...}) need numeric bounds; "not" nests
+    if not isinstance(constraint, dict):
+        return
+    if set(constraint) == {"not"}:
+        _check_filter(col, constraint["not"])
+        return
+    if not constraint or not set(constraint) <= {"min", "max"} \
+            or not all(value is None or _is_number(value) for value in constraint.values()):
+        raise RequestError(f"Filter '{col}': a range takes numeric 'min' and/or 'max' bounds.")
+
+
+def parse_match_request(payload):
+    """
+    Validates a /match body.
+
+    Returns:
+    - Dict with tenant_ids (list of int), top_n, filters, weights and profiles
+
+    Raises:
+    - RequestError for a malformed body or unknown tenant IDs
+    """
+    if not isinstance(payload, dict):
+        raise RequestError("Body must be a JSON object.")
+
+    tenant_ids = payload.get("tenant_ids")
+    if not isinstance(tenant_ids, list) or not tenant_ids or len(tenant_ids) > MAX_SEEDS \
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in tenant_ids):
+        raise RequestError(f"'tenant_ids' must be a list of 1 to {MAX_SEEDS} integer IDs.")
+    if (logic.store.rows_for_ids(tenant_ids) < 0).any():
+        raise RequestError("One or more tenant IDs are out of range.", status=404)
+
+    top_n = payload.get("top_n", 5)
+    if not isinstance(top_n, int) or isinstance(top_n, bool) or not 1 <= top_n <= MAX_TOP_N:
+        raise RequestError(f"'top_n' must be an integer between 1 and {MAX_TOP_N}.")
+
+    filters = payload.get("filters") or None
+    if filters is not None and not isinstance(filters, dict):
+        raise RequestError("'filters' must be a JSON object.")
+    for col, constraint in (filters or {}).items():
+        _check_filter(col, constraint)
+
+    weights = payload.get("weights")
+    if weights is not None and not isinstance(weights, (str, dict, list)):
+        raise RequestError("'weights' must be a profile name, a JSON object or a list.")
+
+    return {
+        "tenant_ids": tenant_ids,
+        "top_n": top_n,
+        "filters": filters,
+        "weights": weights,
+        "profiles": bool(payload.get("profiles", False)),
+    }
+
+
+class MatchBatcher:
+    """
+    Queues match requests and scores them in micro-batches.
+
+    Parameters:
+    - max_batch: Most requests scored by one batched call
+    - max_wait_ms: Longest time the first request of a batch waits for more
+    - max_pending: Requests queued or in flight before new ones are rejected
+    """
+
+    def __init__(self, max_batch=64, max_wait_ms=2.0, max_pending=1024):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="match")
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def overloaded(self):
+        return self.pending >= self.max_pending
+
+    async def submit(self, request):
+        """
+        Queues a parsed request and waits for its result.
+
+        Raises:
+        - RequestError(503) when the service is overloaded
+        """
+        if self.overloaded:
+            self.rejected += 1
+            raise RequestError("Too many pending requests, retry later.", status=503)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        self.requests += 1
+        try:
+            self._queue.put_nowait((request, future))
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(request, future) for request, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.batches += 1
+            try:
+                results = await loop.run_in_executor(self._executor, score_batch, [r for r, _ in batch])
+            except Exception as e:  # Unexpected failure: fail this batch, keep serving
+                results = [RequestError(f"Matching failed: {e}", status=500)] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+@span("service.batch")
+def score_batch(requests):
+    """
+    Scores parsed requests, one compatible_tenants_batch call per distinct
+    set of filters and weights.
+
+    Returns:
+    - List with one response dict (or RequestError) per request
+    """
+    results = [None] * len(requests)
+    groups = {}
+    for i, request in enumerate(requests):
+        key = (filters_key(request["filters"]), json.dumps(request["weights"], sort_keys=True))
+        groups.setdefault(key, []).append(i)
+
+    for members in groups.values():
+        filters, weights = requests[members[0]]["filters"], requests[members[0]]["weights"]
+        top_n = max(requests[i]["top_n"] for i in members)
+        try:
+            batch = logic.compatible_tenants_batch([requests[i]["tenant_ids"] for i in members], top_n, filters,
+                                                   weights=weights)
+        except (KeyError, TypeError, ValueError) as e:
+            for i in members:
+                results[i] = RequestError(f"Invalid filters or weights: {e}")
+            continue
+
+        for g, i in enumerate(members):
+            n = min(int(batch.counts[g]), requests[i]["top_n"])
+            results[i] = match_response(requests[i], batch.ids[g, :n], batch.scores[g, :n])
+    return results
+
+
+def match_response(request, ids, scores):
+    """JSON-ready /match response for one request."""
+    matches = [{"id_tenant": int(tenant_id), "similarity": float(score)} for tenant_id, score in zip(ids, scores)]
+    if request["profiles"] and matches:
+        table = logic.profiles.table(ids)
+        for match in matches:
+            column = table[match["id_tenant"]]
+            match["profile"] = {attribute: _json_value(value) for attribute, value in column.items()}
+    return {"tenant_ids": request["tenant_ids"], "version": logic.store.version, "matches": matches}
+
+
+# -------------------------------------------------------------
+# HTTP
+# -------------------------------------------------------------
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class MatchService:
+    """
+    Minimal HTTP/1.1 server around a MatchBatcher.
+    """
+
+    def __init__(self, batcher, host="127.0.0.1", port=8000):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.started = time.time()
+        self._server = None
+        self._connections = {}  # handler task -> writer
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._connections.values()):  # Idle keep-alive connections
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle_connection(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                length = headers.get("content-length") or "0"
+                if not length.isdecimal():
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length."}, keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, extra = await self._dispatch(method, path.split("?")[0], body)
+                await self._respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, self.health(), {}
+        if path == "/metrics":
+            return 200, registry.prometheus_text(), {"Content-Type": "text/plain; version=0.0.4"}
+        if path != "/match":
+            return 404, {"error": f"Unknown path: {path}"}, {}
+        if method != "POST":
+            return 405, {"error": "Use POST for /match."}, {"Allow": "POST"}
+
+        try:
+            request = parse_match_request(json.loads(body or b"null"))
+            return 200, await self.batcher.submit(request), {}
+        except json.JSONDecodeError:
+            return 400, {"error": "Body is not valid JSON."}, {}
+        except RequestError as e:
+            extra = {"Retry-After": "1"} if e.status == 503 else {}
+            return e.status, {"error": str(e)}, extra
+
+    def health(self):
+        return {
+            "status": "overloaded" if self.batcher.overloaded else "ok",
+            "version": logic.store.version,
+            "tenants": len(logic.store),
+            "backend": logic.search_backend.name,
+            "pending": self.batcher.pending,
+            "max_pending": self.batcher.max_pending,
+            "requests": self.batcher.requests,
+            "batches": self.batcher.batches,
+            "rejected": self.batcher.rejected,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    @staticmethod
+    async def _respond(writer, status, payload, extra=None, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close", **(extra or {})}
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host, port, max_batch, max_wait_ms, max_pending):
+    service = await MatchService(MatchBatcher(max_batch, max_wait_ms, max_pending), host, port).start()
+    print(f"✅ Matching service for {len(logic.store)} tenants listening on http://{host}:{service.port}")
+    await service.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve tenant matching over HTTP/JSON with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=64, help="Most requests scored together")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="Longest wait for a batch to fill")
+    parser.add_argument("--max-pending", type=int, default=1024, help="Queued requests before answering 503")
+    parser.add_argument("--backend", default="exact", help="Search backend (see logic.use_search_backend)")
+    args = parser.parse_args()
+
+    print("⚙️ Loading tenants...")
+    logic.ensure_loaded()
+    logic.use_search_backend(args.backend)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
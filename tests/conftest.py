@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # Data paths (tenants_dataset.csv, metadata.xlsx, feature_store/) are relative to the repo root
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture
+def small_dataset(tmp_path):
+    # First 400 tenants in a scratch directory, so tests can rewrite the CSV and the store
+    import feature_store
+    raw_path = str(tmp_path / "tenants.csv")
+    pd.read_csv(feature_store.RAW_PATH, nrows=400).to_csv(raw_path, index=False, na_rep="None")
+    return raw_path, str(tmp_path / "store")
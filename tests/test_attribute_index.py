@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from attribute_index import AttributeIndex, Bitmap
+
+# -------------------------------------------------------------
+# BITMAPS
+# -------------------------------------------------------------
+
+@pytest.mark.parametrize("n", [1, 7, 8, 13, 64, 1001])
+def test_bitmap_invert_keeps_padding_cleared(n):
+    mask = np.random.default_rng(n).random(n) < 0.3
+    inverted = ~Bitmap.from_mask(mask)
+    np.testing.assert_array_equal(inverted.to_mask(), ~mask)
+    assert inverted.count() == int((~mask).sum())
+    assert (~Bitmap.empty(n)).count() == n
+    # Padding stays clear, so combining with other bitmaps counts correctly
+    assert (inverted | Bitmap.from_mask(mask)).count() == n
+
+
+@pytest.mark.parametrize("n", [5, 64, 1001])
+def test_bitmap_set_operations_match_masks(n):
+    rng = np.random.default_rng(n)
+    a, b = rng.random(n) < 0.5, rng.random(n) < 0.5
+    left, right = Bitmap.from_mask(a), Bitmap.from_mask(b)
+    np.testing.assert_array_equal((left & right).to_mask(), a & b)
+    np.testing.assert_array_equal((left | right).to_mask(), a | b)
+    np.testing.assert_array_equal((left ^ right).to_mask(), a ^ b)
+
+
+# -------------------------------------------------------------
+# FILTER DICTS
+# -------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def df_raw():
+    return pd.read_csv(feature_store.RAW_PATH, nrows=2000)
+
+
+def test_from_filters_matches_pandas(df_raw):
+    index = AttributeIndex(df_raw)
+    filters = {
+        "smoker": "No",
+        "sleep_schedule": ["Flexible", "Early bird"],
+        "budget": {"min": 400, "max": 800},
+        "likes_pets": {"not": "Yes"},
+        "languages_spoken": "Spanish",
+    }
+    expected = (
+        (df_raw["smoker"] == "No")
+        & df_raw["sleep_schedule"].isin(["Flexible", "Early bird"])
+        & df_raw["budget"].between(400, 800)
+        & (df_raw["likes_pets"] != "Yes")
+        & df_raw["languages_spoken"].fillna("").str.split(",").apply(
+            lambda tokens: "Spanish" in [t.strip() for t in tokens])
+    )
+    assert 0 < expected.sum() < len(df_raw)
+    np.testing.assert_array_equal(index.from_filters(filters).to_mask(), expected.to_numpy())
+
+
+def test_unknown_value_matches_nothing(df_raw):
+    index = AttributeIndex(df_raw)
+    assert index.eq("smoker", "Sometimes").count() == 0
+    with pytest.raises(KeyError):
+        index.between("smoker", 0, 1)
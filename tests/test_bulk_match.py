@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+import bulk_match
+import logic
+
+# -------------------------------------------------------------
+# BULK MATCHING
+# -------------------------------------------------------------
+
+def _write_groups(path, n):
+    ids = [int(i) for i in logic.store.ids[:n + 2]]
+    with open(path, "w", encoding="utf-8") as f:
+        for g in range(n):
+            f.write(json.dumps({"group_id": f"g{g}", "tenant_ids": ids[g:g + 2]}) + "\n")
+
+
+def _interrupt_at(monkeypatch, group_id):
+    # Fails the batch holding 'group_id'; returns the undo
+    match_batch = bulk_match.match_batch
+
+    def failing(records, *args):
+        if any(record_id == group_id for record_id, _, _ in records):
+            raise RuntimeError("interrupted")
+        return match_batch(records, *args)
+
+    monkeypatch.setattr(bulk_match, "match_batch", failing)
+    return lambda: monkeypatch.setattr(bulk_match, "match_batch", match_batch)
+
+
+def test_bulk_empty_input(tmp_path):
+    input_path, output_path = tmp_path / "empty.jsonl", tmp_path / "out.jsonl"
+    input_path.write_text("")
+    summary = bulk_match.run(str(input_path), str(output_path))
+    assert summary["groups"] == 0
+    assert output_path.read_text() == ""
+    assert not os.path.exists(f"{output_path}.checkpoint")
+
+
+def test_bulk_resumes_after_interruption(tmp_path, monkeypatch):
+    logic.ensure_loaded()
+    input_path = str(tmp_path / "groups.jsonl")
+    _write_groups(input_path, 50)
+    expected_path, output_path = str(tmp_path / "expected.jsonl"), str(tmp_path / "out.jsonl")
+    bulk_match.run(input_path, expected_path, top_n=3, batch_size=8, workers=2)
+
+    undo = _interrupt_at(monkeypatch, "g30")
+    with pytest.raises(RuntimeError):
+        bulk_match.run(input_path, output_path, top_n=3, batch_size=8, workers=2)
+    assert os.path.exists(f"{output_path}.checkpoint")
+
+    undo()
+    summary = bulk_match.run(input_path, output_path, top_n=3, batch_size=8, workers=2)
+    assert summary["skipped"] == 24
+    with open(output_path, "rb") as f, open(expected_path, "rb") as g:
+        assert f.read() == g.read()
+    assert not os.path.exists(f"{output_path}.checkpoint")
+
+
+def test_bulk_refuses_to_resume_a_changed_input(tmp_path, monkeypatch):
+    logic.ensure_loaded()
+    input_path, output_path = str(tmp_path / "groups.jsonl"), str(tmp_path / "out.jsonl")
+    _write_groups(input_path, 50)
+
+    undo = _interrupt_at(monkeypatch, "g30")
+    with pytest.raises(RuntimeError):
+        bulk_match.run(input_path, output_path, top_n=3, batch_size=8, workers=2)
+    undo()
+
+    _write_groups(input_path, 40)
+    with pytest.raises(ValueError, match="--restart"):
+        bulk_match.run(input_path, output_path, top_n=3, batch_size=8, workers=2)
+    summary = bulk_match.run(input_path, output_path, top_n=3, batch_size=8, workers=2, restart=True)
+    assert summary["groups"] == 40 and summary["skipped"] == 0
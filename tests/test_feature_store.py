@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+
+# -------------------------------------------------------------
+# STALENESS
+# -------------------------------------------------------------
+
+def test_load_reuses_a_fresh_store(small_dataset):
+    raw_path, store_dir = small_dataset
+    built = feature_store.build_feature_store(raw_path, store_dir)
+    loaded = feature_store.load_feature_store(raw_path, store_dir)
+    assert loaded.version == built.version
+    np.testing.assert_array_equal(np.asarray(loaded.matrix), np.asarray(built.matrix))
+
+
+def test_csv_change_forces_a_rebuild(small_dataset, capsys):
+    raw_path, store_dir = small_dataset
+    built = feature_store.build_feature_store(raw_path, store_dir)
+    df = pd.read_csv(raw_path)
+    df.loc[0, "budget"] = df["budget"].max() + 1
+    df.to_csv(raw_path, index=False, na_rep="None")
+    capsys.readouterr()
+
+    loaded = feature_store.load_feature_store(raw_path, store_dir)
+    assert "Building feature store" in capsys.readouterr().out
+    assert loaded.version != built.version
+    assert loaded.manifest["raw_hash"] == feature_store.file_fingerprint(raw_path)
+    assert loaded.schema["data_max"][loaded.columns.index("budget")] == df["budget"].max()
+
+
+def test_interrupted_build_leaves_no_manifest(small_dataset, monkeypatch):
+    raw_path, store_dir = small_dataset
+    built = feature_store.build_feature_store(raw_path, store_dir)
+    pd.read_csv(raw_path).iloc[:300].to_csv(raw_path, index=False, na_rep="None")
+
+    replace = os.replace
+    calls = []
+
+    def failing(src, dst):
+        calls.append(dst)
+        if len(calls) == 2:
+            raise OSError("interrupted")
+        return replace(src, dst)
+
+    monkeypatch.setattr(feature_store.os, "replace", failing)
+    with pytest.raises(OSError):
+        feature_store.build_feature_store(raw_path, store_dir)
+    monkeypatch.setattr(feature_store.os, "replace", replace)
+
+    # One matrix file already holds 300 rows: the old 400-row manifest must be gone
+    assert not os.path.exists(os.path.join(store_dir, feature_store.MANIFEST_FILE))
+    loaded = feature_store.load_feature_store(raw_path, store_dir)
+    assert len(loaded) == 300 and loaded.version != built.version
+
+
+# -------------------------------------------------------------
+# CHUNKED BUILD
+# -------------------------------------------------------------
+
+@pytest.mark.parametrize("chunksize", [7, 37, 128])
+def test_build_does_not_depend_on_chunk_size(small_dataset, tmp_path, chunksize):
+    raw_path, store_dir = small_dataset
+    whole = feature_store.build_feature_store(raw_path, store_dir, chunksize=10_000)
+    chunked = feature_store.build_feature_store(raw_path, str(tmp_path / "chunked"), chunksize=chunksize)
+
+    assert chunked.version == whole.version
+    assert chunked.schema == whole.schema
+    assert chunked.manifest["bound_counts"] == whole.manifest["bound_counts"]
+    np.testing.assert_array_equal(np.asarray(chunked.ids), np.asarray(whole.ids))
+    np.testing.assert_array_equal(np.asarray(chunked.matrix), np.asarray(whole.matrix))
+    np.testing.assert_array_equal(np.asarray(chunked.norms), np.asarray(whole.norms))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import households
+import logic
+from households import Constraints
+
+# -------------------------------------------------------------
+# HARD CONSTRAINTS
+# -------------------------------------------------------------
+
+def test_constraints_valid():
+    # Tenants: 0 free, 1 allergic, 2 pet lover, 3 allergic pet lover, 4 free smoker, 5 free with high budget
+    constraints = Constraints(smoker=[0, 0, 0, 0, 1, 0], allergic=[0, 1, 0, 1, 0, 0],
+                              likes_pets=[0, 0, 1, 1, 0, 0], budget=[500, 500, 500, 500, 500, 900],
+                              budget_band=200)
+    assert constraints.valid([0, 1]) and constraints.valid([0, 2]) and constraints.valid([0, 3])
+    assert not constraints.valid([1, 2])
+    assert not constraints.valid([1, 3]) and not constraints.valid([2, 3])
+    assert not constraints.valid([0, 4])
+    assert not constraints.valid([0, 5])
+
+
+# -------------------------------------------------------------
+# HOUSEHOLD FORMATION
+# -------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def formed():
+    logic.ensure_loaded()
+    ids = [int(i) for i in logic.store.ids[:3000]]
+    frame, report = households.households_for_tenants(ids, k=3, budget_band=200)
+    rows = logic.store.rows_for_ids(frame["id_tenant"].tolist())
+    constraints = Constraints.from_frame(logic.df_raw.iloc[rows], 200)
+    return ids, frame, report, constraints
+
+
+def test_every_household_is_valid(formed):
+    ids, frame, report, constraints = formed
+    assert sorted(frame["id_tenant"]) == sorted(ids)
+    assert frame["size"].max() <= 3
+    for members in frame.groupby("household").indices.values():
+        assert constraints.valid(members)
+    assert report["unassigned"] == int((frame["size"] == 1).sum())
+
+
+def test_allergic_pet_lovers_are_seated(formed):
+    _, frame, report, constraints = formed
+    # They can only live with tenants without pets or allergy: per smoker
+    # answer, the ones beyond that count have to stay alone
+    constrained = constraints.allergic & constraints.likes_pets
+    free = ~constraints.allergic & ~constraints.likes_pets
+    unavoidable = sum(max(0, int((constrained & (constraints.smoker == code)).sum())
+                             - int((free & (constraints.smoker == code)).sum()))
+                      for code in np.unique(constraints.smoker))
+    assert report["unassigned"] <= unavoidable + 0.05 * constrained.sum()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+import ingest
+
+# -------------------------------------------------------------
+# INCREMENTAL INGESTION VS FULL REBUILD
+# -------------------------------------------------------------
+
+def _assert_same_store(store, rebuilt):
+    assert store.version == rebuilt.version
+    np.testing.assert_array_equal(np.asarray(store.ids), np.asarray(rebuilt.ids))
+    np.testing.assert_allclose(np.asarray(store.matrix), np.asarray(rebuilt.matrix), atol=1e-6)
+    assert store.manifest["bound_counts"] == rebuilt.manifest["bound_counts"]
+
+
+def test_ingest_round_trip_matches_full_rebuild(small_dataset, tmp_path):
+    raw_path, store_dir = small_dataset
+    feature_store.build_feature_store(raw_path, store_dir)
+    df = pd.read_csv(raw_path)
+
+    ingest.add_tenants(df.iloc[[5, 6]].drop(columns="id_tenant"), raw_path, store_dir)
+    changed = df.iloc[[10]].copy()
+    changed["smoker"] = "Yes" if changed["smoker"].iloc[0] == "No" else "No"
+    ingest.update_tenants(changed, raw_path, store_dir)
+    store = ingest.remove_tenants([int(df["id_tenant"].iloc[3])], raw_path, store_dir)
+
+    _assert_same_store(store, feature_store.build_feature_store(raw_path, str(tmp_path / "rebuilt")))
+
+
+def test_ingest_rebuilds_when_a_bound_shrinks(small_dataset, tmp_path, capsys):
+    raw_path, store_dir = small_dataset
+    feature_store.build_feature_store(raw_path, store_dir)
+    df = pd.read_csv(raw_path)
+    top = df.loc[df["budget"] == df["budget"].max(), "id_tenant"].tolist()
+
+    store = ingest.remove_tenants(top, raw_path, store_dir)
+    assert "Full rebuild" in capsys.readouterr().out
+    assert store.schema["data_max"][store.columns.index("budget")] == df.loc[~df["id_tenant"].isin(top), "budget"].max()
+    _assert_same_store(store, feature_store.build_feature_store(raw_path, str(tmp_path / "rebuilt")))
+
+
+def test_update_of_a_shared_bound_stays_incremental(small_dataset, tmp_path, capsys):
+    raw_path, store_dir = small_dataset
+    df = pd.read_csv(raw_path)
+    low = df["budget"].min()
+    # Two tenants at the minimum: moving one of them up keeps the bound
+    df.loc[len(df) - 1, "budget"] = low
+    df.to_csv(raw_path, index=False, na_rep="None")
+    feature_store.build_feature_store(raw_path, store_dir)
+    changed = df.loc[df["budget"] == low].iloc[[0]].copy()
+    changed["budget"] = low + 1
+    capsys.readouterr()
+
+    store = ingest.update_tenants(changed, raw_path, store_dir)
+    assert "Full rebuild" not in capsys.readouterr().out
+    _assert_same_store(store, feature_store.build_feature_store(raw_path, str(tmp_path / "rebuilt")))
+
+
+def test_update_rejects_duplicate_ids(small_dataset):
+    raw_path, store_dir = small_dataset
+    feature_store.build_feature_store(raw_path, store_dir)
+    changed = pd.read_csv(raw_path).iloc[[2, 2]]
+    with pytest.raises(ValueError):
+        ingest.update_tenants(changed, raw_path, store_dir)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import feature_store
+import ingest
+from knn_graph import KnnGraph, build_knn_graph, load_knn_graph, save_knn_graph
+from search import ExactSearch
+
+# -------------------------------------------------------------
+# GRAPH LOOKUPS VS EXACT SEARCH
+# -------------------------------------------------------------
+
+def test_graph_answers_equal_exact_search(small_dataset):
+    raw_path, store_dir = small_dataset
+    store = feature_store.build_feature_store(raw_path, store_dir)
+    matrix = np.asarray(store.matrix)
+    graph = KnnGraph(*build_knn_graph(matrix, k=40, block_size=64, n_jobs=2))
+    exact = ExactSearch(matrix)
+
+    rng = np.random.default_rng(0)
+    hits = 0
+    for size in [1, 1, 2, 2, 3] * 20:
+        seeds = rng.integers(0, len(matrix), size)
+        if size == 3:
+            seeds[2] = seeds[0]  # Repeated seed weighs more
+        mask = rng.random(len(matrix)) < 0.8 if size == 2 else None
+        for top_n in (1, 5, 20):
+            answer = graph.search(matrix, seeds, top_n, mask)
+            if answer is None:
+                continue
+            hits += 1
+            rows, scores = exact.search_groups([seeds], top_n, mask=mask)
+            np.testing.assert_allclose(answer[1], scores[0], atol=1e-5)
+            # Same set of tenants up to ties at the last score
+            strict = scores[0] > scores[0, -1] + 1e-5
+            assert set(rows[0][strict]) <= set(answer[0].tolist())
+            assert not np.isin(answer[0], seeds).any()
+            if mask is not None:
+                assert mask[answer[0]].all()
+    assert hits > 100
+
+
+def test_graph_is_dropped_when_the_store_changes(small_dataset):
+    raw_path, store_dir = small_dataset
+    store = feature_store.build_feature_store(raw_path, store_dir)
+    save_knn_graph(store, *build_knn_graph(np.asarray(store.matrix), k=10))
+    assert load_knn_graph(store).k == 10
+
+    df = pd.read_csv(raw_path)
+    store = ingest.remove_tenants([int(df["id_tenant"].iloc[0])], raw_path, store_dir)
+    assert load_knn_graph(store) is None
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import logic
+from search import ShardedExactSearch
+
+# -------------------------------------------------------------
+# TOP-N RECOMMENDATIONS
+# -------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def loaded():
+    logic.ensure_loaded()
+    return logic
+
+
+def _brute_force(seed_ids, top_n, mask=None):
+    # Reference ranking: cosine against the mean of the seed rows, seeds excluded
+    matrix = np.asarray(logic.feature_matrix, dtype=np.float64)
+    rows = logic.store.rows_for_ids(seed_ids)
+    scores = matrix @ matrix[rows].mean(axis=0)
+    allowed = np.ones(len(matrix), dtype=bool) if mask is None else mask.copy()
+    allowed[rows] = False
+    order = np.flatnonzero(allowed)
+    order = order[np.argsort(-scores[order], kind="stable")]
+    return order[:top_n], scores
+
+
+@pytest.mark.parametrize("top_n", [1, 5, 40])
+@pytest.mark.parametrize("filters", [None, {"smoker": "No", "pet_allergy": "No"}])
+def test_returns_exactly_top_n(loaded, top_n, filters):
+    seeds = [int(i) for i in logic.store.ids[[3, 70]]]
+    logic.result_cache.clear()
+    _, similarity = logic.compatible_tenants(seeds, top_n, filters=filters)
+
+    mask = logic.build_filter_mask(filters)
+    expected_rows, scores = _brute_force(seeds, top_n, mask)
+    assert len(similarity) == top_n
+    assert not set(seeds) & set(similarity.index)
+    if mask is not None:
+        assert mask[logic.store.rows_for_ids(similarity.index.tolist())].all()
+    # Same scores as the brute-force ranking (ties may order differently)
+    np.testing.assert_allclose(similarity.to_numpy(), scores[expected_rows], atol=1e-5)
+
+
+def test_returns_fewer_only_when_fewer_qualify(loaded):
+    filters = {"smoker": "Yes", "likes_pets": "Yes", "budget": {"min": 800, "max": 810}}
+    qualifying = int(logic.build_filter_mask(filters).sum())
+    assert 0 < qualifying < 50
+    seeds = [int(logic.store.ids[0])]
+    _, similarity = logic.compatible_tenants(seeds, 50, filters=filters)
+    seed_qualifies = logic.build_filter_mask(filters)[logic.store.rows_for_ids(seeds)[0]]
+    assert len(similarity) == qualifying - int(seed_qualifies)
+
+
+# -------------------------------------------------------------
+# RESULT CACHE
+# -------------------------------------------------------------
+
+def test_cache_key_keeps_repeated_seeds(loaded):
+    seeds = [int(i) for i in logic.store.ids[:2]]
+    logic.result_cache.clear()
+    fresh = logic.compatible_tenants(seeds, 5)[1]
+
+    logic.result_cache.clear()
+    logic.compatible_tenants([seeds[0]] + seeds, 5)
+    cached = logic.compatible_tenants(seeds, 5)[1]
+    pd.testing.assert_series_equal(cached, fresh)
+
+
+def test_cache_key_includes_the_backend(loaded, monkeypatch):
+    seeds = [int(i) for i in logic.store.ids[4:6]]
+    logic.result_cache.clear()
+    logic.compatible_tenants(seeds, 5)
+    hits = logic.result_cache.hits
+    logic.compatible_tenants(seeds, 5)
+    assert logic.result_cache.hits == hits + 1
+
+    # Swapped without clearing, as when a query races a backend switch
+    sharded = ShardedExactSearch(logic.feature_matrix, n_shards=2, workers=2, min_rows=0)
+    monkeypatch.setattr(logic, "search_backend", sharded)
+    try:
+        misses = logic.result_cache.misses
+        logic.compatible_tenants(seeds, 5)
+        assert logic.result_cache.misses == misses + 1
+    finally:
+        sharded.close()
+
+
+# -------------------------------------------------------------
+# SEARCH BACKEND SELECTION
+# -------------------------------------------------------------
+
+def test_reload_keeps_the_selected_backend(loaded):
+    try:
+        previous = logic.use_search_backend("sharded", n_shards=3, workers=2, min_rows=0)
+        seeds = [int(i) for i in logic.store.ids[:2]]
+        logic.compatible_tenants_batch([seeds], 5)  # Starts the thread pool
+        assert previous._pool is not None
+
+        logic.reload_dataset()
+        backend = logic.search_backend
+        assert isinstance(backend, ShardedExactSearch) and backend is not previous
+        assert (backend.n_shards, backend.workers, backend.min_rows) == (3, 2, 0)
+        assert backend.matrix is logic.feature_matrix
+        assert previous._pool is None
+    finally:
+        logic.use_search_backend("exact")
+    assert type(logic.search_backend) is logic.ExactSearch
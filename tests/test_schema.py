@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from schema import load_encoder
+
+# -------------------------------------------------------------
+# ENCODING VS THE ORIGINAL PANDAS PIPELINE
+# -------------------------------------------------------------
+
+def _baseline_encoding(df_raw):
+    # The get_dummies / map pipeline logic.py used before the compiled schema
+    df = df_raw.copy()
+    for lang in ['English', 'Spanish', 'French', 'German', 'Italian']:
+        df[f'lang_{lang}'] = df['languages_spoken'].apply(lambda x: int(lang in x))
+    df = df.drop(['id_tenant', 'languages_spoken'], axis=1)
+    categorical_cols = [
+        'sleep_schedule', 'work_shift', 'energy_rhythm', 'education_level',
+        'social_level', 'cooking_preference', 'preferred_music_genre',
+        'ideal_weekend_plan', 'noise_tolerance', 'relationship_status'
+    ]
+    df = pd.get_dummies(df, columns=categorical_cols)
+    binary_cols = [
+        'likes_reading', 'likes_cooking', 'on_diet', 'smoker', 'likes_pets',
+        'pet_allergy', 'frequent_visits', 'remote_worker', 'plays_sports',
+        'listens_loud_music', 'shares_common_items'
+    ]
+    for col in binary_cols:
+        df[col] = df[col].map({'Yes': 1, 'No': 0})
+    return df.astype(np.float64)
+
+
+@pytest.fixture(scope="module")
+def df_raw():
+    return pd.read_csv(feature_store.RAW_PATH, nrows=5000)
+
+
+def test_encoder_matches_baseline_encoding(df_raw, tmp_path_factory):
+    encoder = load_encoder(feature_store.METADATA_PATH, cache_dir=str(tmp_path_factory.mktemp("schema")))
+    expected = _baseline_encoding(df_raw)
+
+    assert sorted(encoder.columns) == sorted(expected.columns)
+    np.testing.assert_array_equal(encoder.encode(df_raw), expected[encoder.columns].to_numpy())
+
+
+def test_scaled_store_matches_baseline_min_max(df_raw):
+    encoder = load_encoder(feature_store.METADATA_PATH)
+    expected = _baseline_encoding(df_raw)[encoder.columns].to_numpy()
+    data_min, data_max = expected.min(axis=0), expected.max(axis=0)
+    scaled = (expected - data_min) / np.where(data_max > data_min, data_max - data_min, 1.0)
+
+    schema = {"data_min": data_min.tolist(), "data_max": data_max.tolist()}
+    np.testing.assert_allclose(feature_store.scale_raw(encoder.encode(df_raw), schema), scaled, atol=1e-12)
+
+
+def test_cached_compile_matches_fresh_compile(tmp_path):
+    fresh = load_encoder(feature_store.METADATA_PATH, cache_dir=str(tmp_path))
+    cached = load_encoder(feature_store.METADATA_PATH, cache_dir=str(tmp_path))
+    assert cached.columns == fresh.columns
+    assert cached.fingerprint == fresh.fingerprint
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+import search
+from search import ExactSearch, ReweightedSearch, ShardedExactSearch, top_k_rows
+
+# -------------------------------------------------------------
+# TOP-K SELECTION
+# -------------------------------------------------------------
+
+def test_top_k_rows_ranks_ties_by_lower_index():
+    scores = np.array([[1.0, 3.0, 3.0, 3.0, 2.0],
+                       [2.0, 2.0, 2.0, 2.0, 2.0]], dtype=np.float32)
+    rows, values = top_k_rows(scores, 2)
+    assert rows.tolist() == [[1, 2], [0, 1]]
+    assert values.tolist() == [[3.0, 3.0], [2.0, 2.0]]
+
+
+def test_top_k_rows_marks_empty_slots():
+    scores = np.array([[-np.inf, 0.5, -np.inf]], dtype=np.float32)
+    rows, values = top_k_rows(scores, 3)
+    assert rows.tolist() == [[1, -1, -1]]
+    assert values[0, 0] == 0.5 and np.isneginf(values[0, 1:]).all()
+
+
+# -------------------------------------------------------------
+# SHARDED SEARCH
+# -------------------------------------------------------------
+
+def _tied_matrix(n=3000, d=16, seed=0):
+    # Rows repeat, so many scores tie across shard boundaries
+    rng = np.random.default_rng(seed)
+    base = rng.random((n // 6, d), dtype=np.float32)
+    matrix = np.repeat(base, 6, axis=0)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_sharded_search_matches_exact(weighted):
+    matrix = _tied_matrix()
+    rng = np.random.default_rng(1)
+    exact = ExactSearch(matrix, block_size=7)
+    if weighted:
+        exact = ReweightedSearch(matrix, rng.random(matrix.shape[1], dtype=np.float32) * 3)
+    owner = ShardedExactSearch(matrix, n_shards=7, workers=3, min_rows=0)
+    sharded = owner.over(exact)
+    try:
+        seed_rows = [rng.integers(0, len(matrix), size) for size in rng.integers(1, 4, 40)]
+        mask = rng.random(len(matrix)) < 0.7
+        for filters in (None, mask):
+            expected = exact.search_groups(seed_rows, 25, mask=filters)
+            rows, scores = sharded.search_groups(seed_rows, 25, mask=filters)
+            np.testing.assert_array_equal(rows, expected[0])
+            np.testing.assert_array_equal(scores, expected[1])
+    finally:
+        owner.close()
+
+
+def test_concurrent_first_queries_share_one_pool(monkeypatch):
+    created = []
+
+    class SlowPool(search.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            threading.Event().wait(0.05)  # Widen the window between the check and the assignment
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(search, "ThreadPoolExecutor", SlowPool)
+    matrix = _tied_matrix(600)
+    owner = ShardedExactSearch(matrix, n_shards=4, workers=2, min_rows=0)
+    weighted = owner.over(ReweightedSearch(matrix, np.full(matrix.shape[1], 2.0, dtype=np.float32)))
+    barrier = threading.Barrier(8)
+
+    def query(backend):
+        barrier.wait()
+        backend.search_groups([[0, 1]], 5)
+
+    threads = [threading.Thread(target=query, args=(owner if i % 2 else weighted,)) for i in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(created) == 1
+    finally:
+        owner.close()
+    assert owner._pool is None
@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import logic
+import service
+
+# -------------------------------------------------------------
+# HELPERS
+# -------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def ids():
+    logic.ensure_loaded()
+    return [int(i) for i in logic.store.ids[:40]]
+
+
+def _serve(client, **batcher_options):
+    # Runs 'client(service)' against a service on a free port
+    async def main():
+        match_service = await service.MatchService(service.MatchBatcher(**batcher_options), "127.0.0.1", 0).start()
+        try:
+            return await client(match_service)
+        finally:
+            await match_service.stop()
+    return asyncio.run(main())
+
+
+async def _request(port, head, body=b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(head + b"Connection: close\r\n\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+async def _post_match(port, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    return await _request(port, b"POST /match HTTP/1.1\r\nContent-Length: %d\r\n" % len(body), body)
+
+
+def _expected(tenant_ids, top_n, filters=None):
+    _, similarity = logic.compatible_tenants(tenant_ids, top_n, filters=filters)
+    return similarity.index.tolist(), similarity.to_numpy()
+
+
+# -------------------------------------------------------------
+# STATUS CODES
+# -------------------------------------------------------------
+
+def test_match_returns_the_library_result(ids):
+    filters = {"smoker": "No", "budget": {"min": 400, "max": 800}}
+
+    async def client(match_service):
+        return await _post_match(match_service.port, {"tenant_ids": ids[:2], "top_n": 7, "filters": filters})
+
+    status, payload = _serve(client)
+    assert status == 200
+    expected_ids, expected_scores = _expected(ids[:2], 7, filters)
+    assert [m["id_tenant"] for m in payload["matches"]] == expected_ids
+    np.testing.assert_allclose([m["similarity"] for m in payload["matches"]], expected_scores, atol=1e-6)
+    assert payload["version"] == logic.store.version
+
+
+@pytest.mark.parametrize("payload", [
+    b"{not json",
+    {"tenant_ids": "12"},
+    {"tenant_ids": []},
+    {"tenant_ids": [True]},
+    {"tenant_ids": [1], "top_n": 0},
+    {"tenant_ids": [1], "filters": ["smoker"]},
+    {"tenant_ids": [1], "filters": {"budget": {"min": "abc"}}},
+    {"tenant_ids": [1], "filters": {"budget": {"not": {"max": "x"}}}},
+    {"tenant_ids": [1], "filters": {"budget": {}}},
+    {"tenant_ids": [1], "weights": 3},
+])
+def test_malformed_requests_answer_400(ids, payload):
+    async def client(match_service):
+        return await _post_match(match_service.port, payload)
+
+    status, body = _serve(client)
+    assert status == 400 and "error" in body
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1e3", "²".encode("utf-8")])
+def test_bad_content_length_answers_400(length):
+    async def client(match_service):
+        return await _request(match_service.port, b"POST /match HTTP/1.1\r\nContent-Length: " + length + b"\r\n")
+
+    assert _serve(client)[0] == 400
+
+
+def test_unknown_tenants_and_paths_answer_404(ids):
+    async def client(match_service):
+        unknown = await _post_match(match_service.port, {"tenant_ids": [ids[0], -1]})
+        path = await _request(match_service.port, b"GET /nope HTTP/1.1\r\n")
+        method = await _request(match_service.port, b"GET /match HTTP/1.1\r\n")
+        return unknown[0], path[0], method[0]
+
+    assert _serve(client) == (404, 404, 405)
+
+
+# -------------------------------------------------------------
+# MICRO-BATCHING
+# -------------------------------------------------------------
+
+def test_concurrent_requests_are_batched(ids):
+    requests = [{"tenant_ids": ids[i:i + 1 + i % 3], "top_n": 1 + i % 9} for i in range(24)]
+
+    async def client(match_service):
+        responses = await asyncio.gather(*(_post_match(match_service.port, r) for r in requests))
+        return responses, match_service.batcher.batches, match_service.batcher.requests
+
+    responses, batches, n_requests = _serve(client, max_wait_ms=50)
+    assert n_requests == len(requests)
+    assert batches < len(requests)
+    for request, (status, payload) in zip(requests, responses):
+        assert status == 200
+        expected_ids, expected_scores = _expected(request["tenant_ids"], request["top_n"])
+        assert [m["id_tenant"] for m in payload["matches"]] == expected_ids
+        np.testing.assert_allclose([m["similarity"] for m in payload["matches"]], expected_scores, atol=1e-6)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import logic
+from weights import WEIGHT_PROFILES, column_weights
+
+# -------------------------------------------------------------
+# WEIGHTED RANKING
+# -------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def seeds():
+    logic.ensure_loaded()
+    return [int(i) for i in logic.store.ids[[11, 240]]]
+
+
+def _weighted_brute_force(seed_ids, top_n, weights):
+    # Reference: cosine over the column-weighted, re-normalized matrix
+    column = column_weights(weights, logic.explanation_attributes, logic.explanation_aggregation)
+    matrix = np.asarray(logic.feature_matrix, dtype=np.float64) * column
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    rows = logic.store.rows_for_ids(seed_ids)
+    scores = matrix @ matrix[rows].mean(axis=0)
+    scores[rows] = -np.inf
+    order = np.argsort(-scores, kind="stable")[:top_n]
+    return order, scores[order]
+
+
+def test_profile_changes_the_ranking(seeds):
+    logic.result_cache.clear()
+    plain = logic.compatible_tenants(seeds, 20)[1]
+    quiet = logic.compatible_tenants(seeds, 20, weights="quiet_home")[1]
+    assert quiet.index.tolist() != plain.index.tolist()
+
+    _, expected_scores = _weighted_brute_force(seeds, 20, "quiet_home")
+    np.testing.assert_allclose(quiet.to_numpy(), expected_scores, atol=1e-5)
+
+
+def test_profile_and_custom_weights_agree(seeds):
+    # Profiles use a cached pre-weighted matrix, dicts are reweighted on the fly
+    logic.result_cache.clear()
+    profile = logic.compatible_tenants(seeds, 10, weights="social")[1]
+    custom = logic.compatible_tenants(seeds, 10, weights=dict(WEIGHT_PROFILES["social"]))[1]
+    np.testing.assert_allclose(custom.to_numpy(), profile.to_numpy(), atol=1e-5)
+
+
+def test_unit_weights_are_unweighted(seeds):
+    logic.result_cache.clear()
+    plain = logic.compatible_tenants(seeds, 10)[1]
+    balanced = logic.compatible_tenants(seeds, 10, weights="Balanced")[1]
+    assert balanced.index.tolist() == plain.index.tolist()
+    assert logic.resolve_weights({"smoker": 1.0})[1] == ""
+
+
+@pytest.mark.parametrize("weights", [
+    "noisy_home",
+    {"favourite_colour": 2.0},
+    {"smoker": -1.0},
+    {"smoker": float("nan")},
+    [1.0, 2.0],
+])
+def test_invalid_weights_raise(seeds, weights):
+    with pytest.raises(ValueError):
+        logic.compatible_tenants(seeds, 5, weights=weights)
+
+
+def test_all_zero_weights_raise(seeds):
+    with pytest.raises(ValueError):
+        logic.compatible_tenants(seeds, 5, weights={attribute: 0.0 for attribute in logic.explanation_attributes})
@@ -1,20 +1,47 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objs as go
-import streamlit as st
-from collections import Counter
-import plotly.io as pio
+import numpy as np
+import pandas as pd
+import importlib.util
+import io
 import os
+import threading
+from profiling import span
 
-os.makedirs("Media", exist_ok=True)   # This guarantees the folder exists when saving images
+# Plotting libraries (matplotlib, seaborn, plotly, Kaleido) and streamlit are
+# imported inside the functions that use them, so importing this module is
+# cheap and the cost is paid once, on the first render.
+
+def _dark_mode():
+    import streamlit as st
+    return st.get_option("theme.base") == "dark"
+
+
+def close_figure(fig):
+    import matplotlib.pyplot as plt
+    plt.close(fig)
+
+
+def warm_up():
+    # Imports the plotting libraries on a background thread, e.g. while the
+    # dataset loads, so the first chart does not pay for them
+    def load():
+        import matplotlib.pyplot  # noqa: F401
+        import seaborn  # noqa: F401
+        import plotly.graph_objs  # noqa: F401
+
+    thread = threading.Thread(target=load, name="ui-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 # ---------------------------------------------------------------
 # Bar chart with language-aware labels
 # ---------------------------------------------------------------
+@span("ui.chart")
 def generate_compatibility_chart(similarity_series, language='English'):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     similarity_series = similarity_series * 100
-    theme = st.get_option("theme.base")
-    dark_mode = theme == "dark"
+    dark_mode = _dark_mode()
     bar_color = "#BD93F9" if dark_mode else "#6272A4"
     text_color = "white" if dark_mode else "black"
 
@@ -47,15 +74,16 @@ def generate_compatibility_chart(similarity_series, language='English'):
                     xytext=(0, 8),
                     textcoords='offset points', fontsize=8, color=text_color)
 
-    fig.savefig("Media/chart_export.png", dpi=300, bbox_inches='tight')
     return fig
 
 # ---------------------------------------------------------------
 # Table with translated attribute names and values
 # ---------------------------------------------------------------
+@span("ui.table")
 def generate_compatibility_table(result_tuple, language='English'):
-    theme = st.get_option("theme.base")
-    dark_mode = theme == "dark"
+    import plotly.graph_objs as go
+
+    dark_mode = _dark_mode()
     header_color = "#1E1E1E" if dark_mode else "#D3D3D3"
     cell_color = "#292929" if dark_mode else "#FFFFFF"
     text_color = "white" if dark_mode else "black"
@@ -147,66 +175,110 @@ def generate_compatibility_table(result_tuple, language='English'):
     ])
     fig_table.update_layout(autosize=True, margin=dict(l=10, r=10, t=10, b=10), height=500, xaxis=dict(automargin=True))
 
-    num_cols = len(result_df.columns)
-    table_width = 200 + 150 * (num_cols - 1)  # base 200 + 150px per column
+    return fig_table
+
+# ---------------------------------------------------------------
+# PNG exports – rendered in memory, only when downloaded
+# ---------------------------------------------------------------
+@span("ui.chart_png")
+def export_chart_png(similarity_series, language='English'):
+    fig = generate_compatibility_chart(similarity_series, language)
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=300, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        close_figure(fig)   # Figures are never kept around between reruns
 
 
-    # Skip image export on Streamlit Cloud (Kaleido not supported there)
-    if not os.environ.get("STREAMLIT_SERVER_HEADLESS", False):
-        try:
-            pio.write_image(fig_table, "Media/table_export.png", format="png", scale=2, width=table_width, height=600)
-        except Exception as e:
-            print("⚠️ Could not export table image:", e)
+def table_export_available():
+    # Kaleido is needed for Plotly images and is not supported on Streamlit Cloud
+    return not os.environ.get("STREAMLIT_SERVER_HEADLESS", False) and importlib.util.find_spec("kaleido") is not None
 
 
-    return fig_table
+@span("ui.table_png")
+def export_table_png(result_tuple, language='English'):
+    import plotly.io as pio
+
+    fig_table = generate_compatibility_table(result_tuple, language)
+    table_width = 200 + 150 * len(result_tuple[0].columns)  # base 200 + 150px per tenant column
+    return pio.to_image(fig_table, format="png", scale=2, width=table_width, height=600)
+
+
+def memoized(cache, key, render):
+    """
+    Returns cache[key], calling render() first if it is missing. With the
+    per-session 'exports' dict (reset for every new result), figures are
+    built once per result and language instead of on every rerun.
+    """
+    if key not in cache:
+        cache[key] = render()
+    return cache[key]
+
+
+def lazy_export(exports, key, render):
+    """
+    Returns a zero-argument callable for st.download_button: the file is
+    only rendered when the button is clicked, then kept in 'exports'
+    (a per-session dict) so repeated downloads reuse the bytes.
+    """
+    return lambda: memoized(exports, key, render)
 
 # ---------------------------------------------------------------
-# Match explanation block – top shared traits with emojis
+# Match explanation block – attributes driving the similarity scores
 # ---------------------------------------------------------------
-def generate_explanation_block(result_df, language='English'):
-    trait_counter = Counter()
-    traits_used = []
+@span("ui.explanation")
+def generate_explanation_block(contributions, language='English', top_n=5):
+    # contributions: matches x attributes, each row sums to that match's score
+    # (see logic.explain_matches). Rank attributes by their average share.
+    totals = contributions.sum(axis=1).to_numpy()
+    shares = contributions.to_numpy() / np.where(totals == 0, 1.0, totals)[:, None]
+    mean_shares = pd.Series(shares.mean(axis=0), index=contributions.columns)
+    mean_shares = mean_shares[mean_shares > 0].sort_values(ascending=False, kind="stable")
 
-    for i in range(len(result_df)):
-        row = result_df.iloc[i, 1:]
-        trait_name = result_df.iloc[i, 0]
-        values = list(row)
-        if all(v == values[0] for v in values):
-            trait_counter[trait_name] += 1
-            traits_used.append(trait_name)
-
-    top_traits = [trait for trait, _ in trait_counter.most_common(5)]
+    top_traits = mean_shares.index[:top_n].tolist()
 
     trait_emojis = {
         "likes_pets": "🐶", "smoker": "🚭", "on_diet": "🥗", "remote_worker": "💻",
         "cooking_preference": "🍳", "ideal_weekend_plan": "🏞️", "relationship_status": "❤️",
         "sleep_schedule": "🛏️", "social_level": "🗣️", "education_level": "🎓",
         "listens_loud_music": "🎧", "cleanliness_rating": "🧼", "pet_allergy": "🐾",
-        "noise_tolerance": "🔇"
+        "noise_tolerance": "🔇", "languages_spoken": "🗺️", "likes_cooking": "👩‍🍳",
+        "likes_reading": "📚", "work_shift": "🕒", "energy_rhythm": "⚡", "budget": "💶",
+        "frequent_visits": "🚪", "plays_sports": "🏃", "preferred_music_genre": "🎵",
+        "shares_common_items": "🤝"
     }
 
     translations = {
-        "likes_pets": "Likes Pets", "smoker": "Non-smoker", "on_diet": "On Diet",
+        "likes_pets": "Likes Pets", "smoker": "Smoker", "on_diet": "On Diet",
         "remote_worker": "Remote Worker", "cooking_preference": "Cooking Preference",
         "ideal_weekend_plan": "Ideal Weekend Plan", "relationship_status": "Relationship Status",
         "sleep_schedule": "Sleep Schedule", "social_level": "Social Level",
         "education_level": "Education Level", "listens_loud_music": "Loud Music",
-        "cleanliness_rating": "Cleanliness", "pet_allergy": "No Pet Allergy",
-        "noise_tolerance": "Noise Tolerance"
+        "cleanliness_rating": "Cleanliness", "pet_allergy": "Pet Allergy",
+        "noise_tolerance": "Noise Tolerance", "languages_spoken": "Languages Spoken",
+        "likes_cooking": "Likes Cooking", "likes_reading": "Likes Reading",
+        "work_shift": "Work Shift", "energy_rhythm": "Energy Rhythm", "budget": "Budget",
+        "frequent_visits": "Frequent Visits", "plays_sports": "Plays Sports",
+        "preferred_music_genre": "Music Taste", "shares_common_items": "Shares Common Items"
     }
 
     if language == "Español":
         translations = {
-            "likes_pets": "Le gustan las mascotas", "smoker": "No fumador", "on_diet": "Sigue dieta",
+            "likes_pets": "Le gustan las mascotas", "smoker": "Fumador", "on_diet": "Sigue dieta",
             "remote_worker": "Teletrabaja", "cooking_preference": "Preferencia culinaria",
             "ideal_weekend_plan": "Plan ideal de fin de semana", "relationship_status": "Relación sentimental",
             "sleep_schedule": "Horario de sueño", "social_level": "Nivel social",
             "education_level": "Nivel educativo", "listens_loud_music": "Música alta",
-            "cleanliness_rating": "Valor de limpieza", "pet_allergy": "Sin alergia a mascotas",
-            "noise_tolerance": "Tolerancia al ruido"
+            "cleanliness_rating": "Valor de limpieza", "pet_allergy": "Alergia a mascotas",
+            "noise_tolerance": "Tolerancia al ruido", "languages_spoken": "Idiomas hablados",
+            "likes_cooking": "Le gusta cocinar", "likes_reading": "Le gusta leer",
+            "work_shift": "Turno laboral", "energy_rhythm": "Ritmo energético", "budget": "Presupuesto",
+            "frequent_visits": "Visitas frecuentes", "plays_sports": "Practica deporte",
+            "preferred_music_genre": "Gusto musical", "shares_common_items": "Comparte artículos comunes"
         }
 
-    styled = [f"{trait_emojis.get(trait, '🔹')} {translations.get(trait, trait.replace('_', ' ').capitalize())}" for trait in top_traits]
+    styled = [f"{trait_emojis.get(trait, '🔹')} {translations.get(trait, trait.replace('_', ' ').capitalize())} ({mean_shares[trait]:.0%})"
+              for trait in top_traits]
 
     return styled
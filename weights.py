@@ -0,0 +1,205 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from search import ExactSearch, ReweightedSearch
+
+# -------------------------------------------------------------
+# TRAIT WEIGHTS
+# -------------------------------------------------------------
+#
+# By default every encoded column counts equally in the cosine. Weights
+# scale the columns of a raw attribute before normalization, so a weight
+# of 3 on 'noise_tolerance' makes agreeing on it count 9x as much in the
+# dot product (cosine of x * w and y * w).
+#
+# Weights are given as:
+# - a profile name from WEIGHT_PROFILES ("quiet_home", "quiet home", ...)
+# - a dict attribute -> weight (unlisted attributes keep weight 1)
+# - an array with one weight per attribute (ordered as
+#   logic.explanation_attributes) or per encoded column
+#
+# Named profiles are served from a pre-scaled, pre-normalized copy of the
+# matrix (same query cost as unweighted); custom weights from the original
+# matrix through ReweightedSearch (one pass to compute the weighted norms,
+# no preprocessing). Both are kept in a byte-bounded LRU cache that is
+# dropped when the dataset version changes. With the sharded search backend,
+# logic.resolve_weights shards them the same way (ShardedExactSearch.over).
+
+WEIGHT_PROFILES = {
+    "balanced": {},
+    "quiet_home": {
+        "noise_tolerance": 3.0,
+        "listens_loud_music": 3.0,
+        "frequent_visits": 2.0,
+        "sleep_schedule": 2.0,
+        "smoker": 2.0,
+        "energy_rhythm": 1.5,
+        "cleanliness_rating": 1.5,
+        "preferred_music_genre": 0.5,
+    },
+    "social": {
+        "social_level": 3.0,
+        "ideal_weekend_plan": 2.0,
+        "frequent_visits": 2.0,
+        "shares_common_items": 2.0,
+        "languages_spoken": 2.0,
+        "likes_cooking": 1.5,
+        "plays_sports": 1.5,
+        "preferred_music_genre": 1.5,
+    },
+}
+
+PROFILE_LABELS = {"balanced": "Balanced", "quiet_home": "Quiet home", "social": "Social"}
+
+# Memory for cached weighted matrices (profiles larger than this are served
+# through ReweightedSearch instead)
+MAX_CACHE_BYTES = 512 << 20
+
+
+def profile_name(name):
+    """Canonical profile name ("Quiet home" -> "quiet_home")."""
+    return "_".join(str(name).lower().replace("-", " ").split())
+
+
+def column_weights(weights, attributes, aggregation):
+    """
+    Resolves weights to one float32 weight per encoded column.
+
+    Parameters:
+    - weights: Profile name, dict attribute -> weight, or array (see above)
+    - attributes / aggregation: Output of explanations.attribute_aggregation
+
+    Returns:
+    - float32 array (n_columns), or None when every weight is 1
+
+    Raises:
+    - ValueError for an unknown profile or attribute, a wrong length, or
+      negative / all-zero weights
+    """
+    if weights is None:
+        return None
+    if isinstance(weights, str):
+        name = profile_name(weights)
+        if name not in WEIGHT_PROFILES:
+            raise ValueError(f"Unknown weight profile: {weights} (available: {', '.join(WEIGHT_PROFILES)})")
+        weights = WEIGHT_PROFILES[name]
+
+    if isinstance(weights, dict):
+        unknown = sorted(set(weights) - set(attributes))
+        if unknown:
+            raise ValueError(f"Unknown attributes in weights: {', '.join(map(str, unknown))}")
+        weights = [float(weights.get(attribute, 1.0)) for attribute in attributes]
+
+    weights = np.asarray(weights, dtype=np.float32)
+    n_columns, n_attributes = aggregation.shape
+    if weights.shape == (n_attributes,):
+        weights = aggregation @ weights
+    elif weights.shape != (n_columns,):
+        raise ValueError(f"Expected {n_attributes} attribute weights or {n_columns} column weights, "
+                         f"got shape {weights.shape}")
+    if not np.isfinite(weights).all() or (weights < 0).any() or not weights.any():
+        raise ValueError("Weights must be finite, non-negative and not all zero.")
+    return None if (weights == 1).all() else weights
+
+
+def weights_key(weights, column_weights_):
+    """
+    Hashable cache key: the profile name, or a digest of the column weights.
+    """
+    if column_weights_ is None:
+        return ""
+    if isinstance(weights, str):
+        return profile_name(weights)
+    return "custom:" + hashlib.sha1(column_weights_.tobytes()).hexdigest()[:16]
+
+
+def weighted_matrix(matrix, weights, chunk=1 << 16):
+    """
+    Pre-scaled, re-normalized float32 copy of 'matrix' (rows x * w / |x * w|).
+    """
+    weighted = np.empty(matrix.shape, dtype=np.float32)
+    for start in range(0, len(matrix), chunk):
+        rows = np.asarray(matrix[start:start + chunk], dtype=np.float32) * weights
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        weighted[start:start + chunk] = np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+    return weighted
+
+
+class WeightedBackendCache:
+    """
+    Thread-safe LRU cache of search backends per weights key, bounded by
+    the memory they hold.
+
+    Attributes:
+    - max_bytes: Memory budget; least recently used backends are evicted beyond it
+    - version: Dataset version the entries belong to
+    - hits / misses / evictions: Counters
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def bind(self, version):
+        """Drops every entry if the dataset version changed."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.nbytes = 0
+                self.version = version
+
+    def backend(self, key, matrix, weights, profile):
+        """
+        Returns the backend for 'key', building it on a miss: an ExactSearch
+        over a weighted copy of 'matrix' for profiles that fit the budget,
+        otherwise a ReweightedSearch.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        if profile and matrix.shape[0] * matrix.shape[1] * 4 <= self.max_bytes:
+            backend = ExactSearch(weighted_matrix(matrix, weights))
+            backend.name = "weighted"
+            size = backend.matrix.nbytes
+        else:
+            backend = ReweightedSearch(matrix, weights)
+            size = backend.nbytes
+
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = (backend, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted
+                    self.evictions += 1
+        return backend
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": list(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }